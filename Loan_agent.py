@@ -1,35 +1,76 @@
 import os
+import asyncio
+import inspect
+import threading
+import weakref
 from pathlib import Path
 import operator
 from typing import TypedDict, Annotated, List, Optional, Union
 from dotenv import load_dotenv
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.prompts.chat import BaseChatPromptTemplate, BaseStringMessagePromptTemplate
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.postgres import PostgresSaver
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.tools import tool
-from pydantic import BaseModel, Field
+from langchain_core.tools import tool
+from pydantic import BaseModel, Field, create_model
 import re
 import requests
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from langgraph.checkpoint.sqlite import SqliteSaver
-import sqlite3
-import uuid
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+import http_client
+from id_generator import uuid7
+import loan_math
+import intent_classifier
+import response_cache
+import option_parser
+import registration_parser
+import llm_gateway
 from datetime import datetime
 
+# Importing this module is cheap: the Gemini client, the compiled graph and
+# its checkpointer are built on first use (get_base_llm(), get_app(),
+# get_async_app()), and reportlab, langgraph and the Gemini SDK are only
+# imported by the functions that need them. `Loan_agent.app` still works; it
+# calls get_app() (see __getattr__ at the bottom).
+
 load_dotenv('api_secret.env')
 api_key = os.environ.get('API_KEY')
 
 
-llm = ChatGoogleGenerativeAI(model='gemini-2.5-flash', google_api_key=api_key)
+# "gemini" (default) or "offline": offline_llm's deterministic stand-in, for
+# benchmarking and load-testing the graph without network access.
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini").lower()
+
+_base_llm = None
+_base_llm_lock = threading.Lock()
+
+
+def get_base_llm():
+    """
+    The chat model for LLM_BACKEND, built on first use. One attempt per request:
+    retries, rate limiting, deadlines and hedging are handled by llm_gateway,
+    which every LLM runnable below is wrapped in.
+    """
+    global _base_llm
+    with _base_llm_lock:
+        if _base_llm is None and LLM_BACKEND == "offline":
+            from offline_llm import OfflineChatModel
+
+            _base_llm = OfflineChatModel()
+            print("LLM backend: offline stand-in (no Gemini calls)")
+        elif _base_llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            _base_llm = ChatGoogleGenerativeAI(model='gemini-2.5-flash', google_api_key=api_key, max_retries=1)
+        return _base_llm
+
+
+# Each wrapper takes a factory, so no client is built until the first call
+llm = llm_gateway.guarded(get_base_llm, "llm")
+
+# Calls whose text goes straight to the customer. The tag lets UIs streaming
+# the graph (stream_mode="messages") show their tokens as they arrive, while
+# structured extraction and intent checks stay hidden. Not hedged, since a
+# duplicate would stream the reply twice.
+USER_REPLY_TAG = "user_reply"
+chat_llm = llm_gateway.guarded(lambda: get_base_llm().with_config(tags=[USER_REPLY_TAG]), "chat_llm", hedge=False)
 
 # Structuring llm for giving exactly the loan details
 class LoanDetails(BaseModel):
@@ -38,7 +79,7 @@ class LoanDetails(BaseModel):
     interest_rate: float = Field(description="The annual interest rate (e.g., 8.5).")
     tenure_years: int = Field(description="The loan tenure in years.")
 
-structured_llm = llm.with_structured_output(LoanDetails)
+structured_llm = llm_gateway.guarded(lambda: get_base_llm().with_structured_output(LoanDetails), "structured_llm")
 
 
 class AddNewCustomer(BaseModel):
@@ -48,74 +89,118 @@ class AddNewCustomer(BaseModel):
     credit_score : int
     pin : str
 
-customer_data_llm = llm.with_structured_output(AddNewCustomer)
+customer_data_llm = llm_gateway.guarded(
+    lambda: get_base_llm().with_structured_output(AddNewCustomer), "customer_data_llm"
+)
+
+# registration_parser reads the well-formed registration messages; the LLM
+# is only asked for the fields it couldn't, through a structured-output
+# model holding just those fields (one per combination, built on first use).
+_partial_customer_llms = {}
+
+
+def partial_customer_data_llm(missing_fields):
+    key = tuple(missing_fields)
+    if key not in _partial_customer_llms:
+        partial_model = create_model(
+            "AddNewCustomerPartial",
+            **{name: (AddNewCustomer.model_fields[name].annotation, ...) for name in key}
+        )
+        _partial_customer_llms[key] = llm_gateway.guarded(
+            lambda: get_base_llm().with_structured_output(partial_model), "customer_data_llm"
+        )
+    return _partial_customer_llms[key]
 
 
 #Tools are here 
-CRM_API_URL = "http://localhost:8000/crm/verify"
-LOAN_API_URL = "http://localhost:8000/loans/options"
-LOG_API_URL = "http://localhost:8000/applications/log"
-FETCH_APPLICATION_URL = "http://localhost:8000/applications2"
-ADD_CUSTOMER_URL = "http://localhost:8000/add_customer"
+# Every URL can be overridden from the environment; by default they all hang
+# off API_BASE_URL. Calls go through http_client (pooled, timeouts, retries).
+API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8000")
+CUSTOMER_360_URL = os.environ.get("CUSTOMER_360_URL", f"{API_BASE_URL}/crm/customer360")
+LOAN_QUOTE_URL = os.environ.get("LOAN_QUOTE_URL", f"{API_BASE_URL}/loans/quote")
+LOG_API_URL = os.environ.get("LOG_API_URL", f"{API_BASE_URL}/applications/log")
+FETCH_APPLICATION_URL = os.environ.get("FETCH_APPLICATION_URL", f"{API_BASE_URL}/applications")
+CUSTOMER_APPLICATIONS_URL = os.environ.get("CUSTOMER_APPLICATIONS_URL", f"{API_BASE_URL}/customers/{{customer_id}}/applications")
+ADD_CUSTOMER_URL = os.environ.get("ADD_CUSTOMER_URL", f"{API_BASE_URL}/add_customer")
 UPLOAD_DIRECTORY = "./uploads/"
 
+# Each API tool below has a blocking body (used by app.invoke) and an async
+# twin attached as its coroutine (used by app.ainvoke/astream). Both share the
+# response handling; only the transport call differs.
+def _crm_lookup_result(response):
+    """200 -> the payload, 404 -> Not Found, anything else -> Error."""
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 404:
+        print("Tool Error: Customer not found (404)")
+        return {"status": "Not Found", "detail": "Customer not found"}
+    else:
+        print(f"Tool Error: API returned status {response.status_code}")
+        return {"status": "Error", "detail": f"API server error: {response.text}"}
+
+
+def _options_result(response, key):
+    """200 -> the payload, anything else -> Error with the detail under `key`."""
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 404:
+        print("Tool Error: Loan options not found (404)")
+        return {"status": "Not Found", key: "Customer not found"}
+    else:
+        print(f"Tool Error: API returned status {response.status_code}")
+        return {"status": "Error", key: f"API server error: {response.text}"}
+
+
+def _connection_failed(key="detail"):
+    # This handles the case where the server is not running
+    print(f"Tool Error: Connection to CRM server failed. Is server.py running?")
+    return {"status": "Error", key: "Connection to CRM server failed."}
+
+
 @tool
-def get_customer_details_tool(phone : str, pin : str):
+def get_customer_360_tool(phone : str, pin : str):
     """
-    Searches the CRM database for customer details using their phone number.
-    Returns a dictionary with customer data if found, or an error if not.
+    Verifies the customer and, in the same call, returns their profile, the loan
+    options they are eligible for (already filtered by the 2x pre-approved-limit
+    rule) and their most recent applications.
     """
     try:
-        response = requests.get(CRM_API_URL, params={'phone': phone, 'pin': pin})
+        return _crm_lookup_result(http_client.get('customer_360', CUSTOMER_360_URL, params={'phone': phone, 'pin': pin}))
+    except requests.RequestException as e:
+        return _connection_failed()
 
-        if response.status_code == 200:
-            print(response)
-            return response.json()
-        elif response.status_code == 404: 
-            print("Tool Error: Customer not found (404)")
-            return {"status": "Not Found", "detail": "Customer not found"}
-        
-        else:
-            print(f"Tool Error: API returned status {response.status_code}")
-            return {"status": "Error", "detail": f"API server error: {response.text}"}
-    
-    except requests.ConnectionError as e:
-        # This handles the case where the server is not running
-        print(f"Tool Error: Connection to CRM server failed. Is server.py running?")
-        return {"status": "Error", "detail": "Connection to CRM server failed."}
-    
-@tool
-def get_loan_options_tool(credit_score: int):
-    """
-    Searches the CRM database for loan options details using their credit scores.
-    Returns a dictionary with loan options if found, or an error if not.
-    """
+async def _aget_customer_360(phone : str, pin : str):
     try:
-        response = requests.get(LOAN_API_URL, params={'credit_score': credit_score})
+        return _crm_lookup_result(await http_client.aget('customer_360', CUSTOMER_360_URL, params={'phone': phone, 'pin': pin}))
+    except requests.RequestException as e:
+        return _connection_failed()
+
+get_customer_360_tool.coroutine = _aget_customer_360
 
-        if response.status_code == 200:
-            print(response)
-            return response.json()
-        elif response.status_code == 404: 
-            print("Tool Error: Loan options not found (404)")
-            return {"status": "Not Found", "options": "Customer not found"}
-        
-        else:
-            print(f"Tool Error: API returned status {response.status_code}")
-            return {"status": "Error", "options": f"API server error: {response.text}"}
-    
-    except requests.ConnectionError as e:
-        # This handles the case where the server is not running
-        print(f"Tool Error: Connection to CRM server failed. Is server.py running?")
-        return {"status": "Error", "": "Connection to CRM server failed."}
-    
 @tool
-def log_application_tool(customer_id: int, plan_name: str, amount: int, interest_rate: float, tenure_years: int , application_id: str) -> dict:
+def get_loan_quotes_tool(customer_id: Optional[int] = None, credit_score: Optional[int] = None):
     """
-    Logs a finalized loan application to the bank's database via the API.
+    Fetches every loan option the customer can be offered, each with its
+    monthly EMI, total payable and total interest. Uses the customer's
+    eligibility when customer_id is given, otherwise the credit score band.
     """
-    print("---TOOL: Logging application to database---")
-    payload = {
+    params = {'customer_id': customer_id} if customer_id else {'credit_score': credit_score}
+    try:
+        return _options_result(http_client.get('loan_quote', LOAN_QUOTE_URL, params=params), 'quotes')
+    except requests.RequestException as e:
+        return _connection_failed('quotes')
+
+async def _aget_loan_quotes(customer_id: Optional[int] = None, credit_score: Optional[int] = None):
+    params = {'customer_id': customer_id} if customer_id else {'credit_score': credit_score}
+    try:
+        return _options_result(await http_client.aget('loan_quote', LOAN_QUOTE_URL, params=params), 'quotes')
+    except requests.RequestException as e:
+        return _connection_failed('quotes')
+
+get_loan_quotes_tool.coroutine = _aget_loan_quotes
+
+def _application_payload(customer_id, plan_name, amount, interest_rate, tenure_years, application_id):
+    return {
         "application_id": application_id,
         "customer_id": customer_id,
         "plan_name": plan_name,
@@ -123,15 +208,35 @@ def log_application_tool(customer_id: int, plan_name: str, amount: int, interest
         "interest_rate": interest_rate,
         "tenure_years": tenure_years
     }
+
+def _write_result(response):
+    if response.status_code == 200:
+        return response.json() # {"status": "success", "application_id": 12345}
+    else:
+        return {"status": "error", "detail": response.text}
+
+@tool
+def log_application_tool(customer_id: int, plan_name: str, amount: int, interest_rate: float, tenure_years: int , application_id: str) -> dict:
+    """
+    Logs a finalized loan application to the bank's database via the API.
+    """
+    print("---TOOL: Logging application to database---")
+    payload = _application_payload(customer_id, plan_name, amount, interest_rate, tenure_years, application_id)
     try:
-        response = requests.post(LOG_API_URL, json=payload)
-        if response.status_code == 200:
-            return response.json() # {"status": "success", "application_id": 12345}
-        else:
-            return {"status": "error", "detail": response.text}
+        return _write_result(http_client.post('log_application', LOG_API_URL, json=payload))
     except Exception as e:
         return {"status": "error", "detail": f"API connection error: {e}"}
 
+async def _alog_application(customer_id: int, plan_name: str, amount: int, interest_rate: float, tenure_years: int , application_id: str) -> dict:
+    print("---TOOL: Logging application to database---")
+    payload = _application_payload(customer_id, plan_name, amount, interest_rate, tenure_years, application_id)
+    try:
+        return _write_result(await http_client.apost('log_application', LOG_API_URL, json=payload))
+    except Exception as e:
+        return {"status": "error", "detail": f"API connection error: {e}"}
+
+log_application_tool.coroutine = _alog_application
+
 # --- 2. Tool to generate the sanction letter PDF ---
 PDF_DIRECTORY = "./sanction_letters"
 
@@ -150,6 +255,11 @@ def generate_sanction_letter_tool(
     Returns the file path of the generated PDF.
     """
     print("---TOOL: Generating enhanced sanction letter PDF with amortization table---")
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
     
     # Ensure directory exists
     if not os.path.exists(PDF_DIRECTORY):
@@ -356,6 +466,23 @@ def generate_sanction_letter_tool(
         print(f"Error generating PDF: {e}")
         return f"Error: Could not generate PDF. {e}"
 
+async def _agenerate_sanction_letter(
+    application_id: str, 
+    customer_name: str, 
+    amount: int, 
+    interest_rate: float, 
+    tenure_years: int,
+    amortization_data: Optional[dict]
+) -> str:
+    # reportlab is blocking and CPU-bound: build the PDF on a worker thread so
+    # the event loop keeps serving other conversations meanwhile.
+    return await asyncio.to_thread(
+        generate_sanction_letter_tool.func,
+        application_id, customer_name, amount, interest_rate, tenure_years, amortization_data
+    )
+
+generate_sanction_letter_tool.coroutine = _agenerate_sanction_letter
+
 @tool
 def check_file_storage_tool(customer_id: int) -> dict:
     """
@@ -392,7 +519,7 @@ def calculate_amortization_schedule_tool(amount: int, interest_rate: float, tenu
     try:
         monthly_rate = interest_rate/100/12
         total_months = tenure_years*12
-        monthly_payment = amount*(monthly_rate*(1+monthly_rate)**total_months)/((monthly_rate*((1+monthly_rate)**total_months))-1)
+        monthly_payment = float(loan_math.monthly_emi(amount, interest_rate, tenure_years))
 
         schedule = []
         total_interest = 0
@@ -429,6 +556,12 @@ def calculate_amortization_schedule_tool(amount: int, interest_rate: float, tenu
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
+def _loan_detail_result(response):
+    if response.status_code == 200:
+        return {'status': 'success', 'loan': response.json()}
+    else:
+        return {'status': 'not_found', 'detail': 'loan_not_found'}
+
 @tool
 def get_loan_detail_tool(application_id: str):
     """
@@ -436,21 +569,60 @@ def get_loan_detail_tool(application_id: str):
     This allows users to query their existing loans.
     """
     try:
-        response = requests.get(FETCH_APPLICATION_URL, params=application_id)
-        if response.status_code == 200:
-            return {'status': 'success', 'loan': response.json()}
-        else:
-            return {'status': 'not_found', 'detail': 'loan_not_found'}
+        return _loan_detail_result(http_client.get('fetch_application', FETCH_APPLICATION_URL, params={'application_id': application_id}))
+    except Exception as e:
+        return {'status': 'error', 'details': str(e)}
 
+async def _aget_loan_detail(application_id: str):
+    try:
+        return _loan_detail_result(await http_client.aget('fetch_application', FETCH_APPLICATION_URL, params={'application_id': application_id}))
     except Exception as e:
         return {'status': 'error', 'details': str(e)}
-     
+
+get_loan_detail_tool.coroutine = _aget_loan_detail
+
+def _applications_page_result(response):
+    if response.status_code == 200:
+        page = response.json()
+        return {
+            'status': 'success',
+            'applications': page['applications'],
+            'has_more': page['next_cursor'] is not None
+        }
+    else:
+        return {'status': 'error', 'detail': response.text}
+
 @tool
-def add_new_customer_tool(name: str, phone: str, address: str, credit_score: int, pin: str , pre_approved_limit: int ) -> dict :
-    """Adds a new customer with all their detals in to the database, making a new account for them"""
+def list_customer_applications_tool(customer_id: int, limit: int = 10) -> dict:
+    """
+    Lists a customer's loan applications, newest first, in a single bounded call.
+    Returns the applications plus whether the customer has more than `limit` of them.
+    """
+    print(f"---TOOL: Listing applications for customer {customer_id}---")
+    try:
+        return _applications_page_result(http_client.get(
+            'customer_applications',
+            CUSTOMER_APPLICATIONS_URL.format(customer_id=customer_id),
+            params={'limit': limit}
+        ))
+    except Exception as e:
+        return {'status': 'error', 'detail': f"API connection error: {e}"}
 
-    print('-----TOOL Adding customer---------')
-    payload = {
+async def _alist_customer_applications(customer_id: int, limit: int = 10) -> dict:
+    print(f"---TOOL: Listing applications for customer {customer_id}---")
+    try:
+        return _applications_page_result(await http_client.aget(
+            'customer_applications',
+            CUSTOMER_APPLICATIONS_URL.format(customer_id=customer_id),
+            params={'limit': limit}
+        ))
+    except Exception as e:
+        return {'status': 'error', 'detail': f"API connection error: {e}"}
+
+list_customer_applications_tool.coroutine = _alist_customer_applications
+
+def _customer_payload(name, phone, address, credit_score, pin, pre_approved_limit):
+    return {
         'customer_name' : name,
         'customer_phone' : phone,
         'customer_address' : address, 
@@ -459,16 +631,32 @@ def add_new_customer_tool(name: str, phone: str, address: str, credit_score: int
         'pin' : pin
     }
 
+def _add_customer_result(response):
+    if response.status_code == 200:
+        return response.json()
+    else:
+        return {'status': 'error', 'details': response.text}
+
+@tool
+def add_new_customer_tool(name: str, phone: str, address: str, credit_score: int, pin: str , pre_approved_limit: int ) -> dict :
+    """Adds a new customer with all their detals in to the database, making a new account for them"""
+
+    print('-----TOOL Adding customer---------')
+    payload = _customer_payload(name, phone, address, credit_score, pin, pre_approved_limit)
     try:
-        response = requests.post(ADD_CUSTOMER_URL, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        
-        else:
-            return {'status': 'error', 'details': response.text}
-        
+        return _add_customer_result(http_client.post('add_customer', ADD_CUSTOMER_URL, json=payload))
     except Exception as e:
         return {"status": "error", "detail": f"API connection error: {e}"}
+
+async def _aadd_new_customer(name: str, phone: str, address: str, credit_score: int, pin: str , pre_approved_limit: int ) -> dict :
+    print('-----TOOL Adding customer---------')
+    payload = _customer_payload(name, phone, address, credit_score, pin, pre_approved_limit)
+    try:
+        return _add_customer_result(await http_client.apost('add_customer', ADD_CUSTOMER_URL, json=payload))
+    except Exception as e:
+        return {"status": "error", "detail": f"API connection error: {e}"}
+
+add_new_customer_tool.coroutine = _aadd_new_customer
         
         
 
@@ -495,7 +683,9 @@ class Loan_agent_state(TypedDict):
 
     routing_decision : str
 
+    eligible_options : Optional[List[dict]]
     presented_options : Optional[List[LoanDetails]]
+    offer_quotes : Optional[List[dict]]
     selected_loan : Optional[LoanDetails]
     offers_just_presented : Optional[bool]
 
@@ -506,6 +696,86 @@ class Loan_agent_state(TypedDict):
 
 
 
+# Phrases that mean "list every loan I have" rather than a question about the current one
+LOAN_LIST_PHRASES = ['all my loans', 'my loans', 'list my loans', 'loan history', 'my applications', 'previous loans']
+LOAN_LIST_LIMIT = 10
+
+# Replies to generic small talk ("hi", "thanks", "what do you do") in the
+# SalesAgent fallback are reused instead of regenerated (see response_cache.py)
+fallback_cache = response_cache.ResponseCache(name="fallback_cache")
+
+
+# --- Sync/async node driver ---
+# Nodes that talk to the LLM or the API are written once, as generators:
+# instead of calling `x.invoke(input)` they `yield Call(x, input)` and get
+# the result sent back. graph_node() turns such a generator into a runnable
+# that makes those calls with .invoke() under app.invoke and with .ainvoke()
+# under async_app.ainvoke/astream, so the same node logic serves both.
+# Yielding a list of independent Calls gets a list of results back; the
+# async driver runs them concurrently, the sync one in order.
+class Call:
+    """A call to a Runnable (LLM, structured LLM or tool) requested by a node."""
+
+    def __init__(self, runnable, input):
+        self.runnable = runnable
+        self.input = input
+
+
+def _invoke(call):
+    if isinstance(call, list):
+        return [c.runnable.invoke(c.input) for c in call]
+    return call.runnable.invoke(call.input)
+
+
+async def _ainvoke(call):
+    if isinstance(call, list):
+        return list(await asyncio.gather(*(c.runnable.ainvoke(c.input) for c in call)))
+    return await call.runnable.ainvoke(call.input)
+
+
+def _run_node(node, state):
+    steps = node(state)
+    if not inspect.isgenerator(steps):
+        return steps
+    try:
+        call = next(steps)
+        while True:
+            try:
+                result = _invoke(call)
+            except Exception as e:
+                # Raise it inside the node so its own try/except handles it
+                call = steps.throw(e)
+            else:
+                call = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def _arun_node(node, state):
+    steps = node(state)
+    if not inspect.isgenerator(steps):
+        return steps
+    try:
+        call = next(steps)
+        while True:
+            try:
+                result = await _ainvoke(call)
+            except Exception as e:
+                call = steps.throw(e)
+            else:
+                call = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+def graph_node(node):
+    """Wraps a node (plain function or Call-yielding generator) for both sync and async graphs."""
+    async def arun(state):
+        return await _arun_node(node, state)
+
+    return RunnableLambda(lambda state: _run_node(node, state), afunc=arun, name=node.__name__)
+
+
 # SalesAgent node, this node communicated with the user and learn intent. 
 def SalesAgent(state: Loan_agent_state):
     """
@@ -598,7 +868,7 @@ def SalesAgent(state: Loan_agent_state):
             "Keep it brief and welcoming."
             "Ask if the user is an existing customer of Tata Capital"
         )
-        ai_response = llm.invoke(prompt).content
+        ai_response = (yield Call(chat_llm, prompt)).content
         return {
             'messages': [AIMessage(content=ai_response)], 
             'routing_decision': 'waiting_for_user'
@@ -698,6 +968,13 @@ def SalesAgent(state: Loan_agent_state):
             return {"routing_decision": "goto_loan_query"}
 
 
+    # CHECK 3b: Verified customer asking to see all of their loans
+    if state.get('is_verified') and isinstance(last_message_obj, HumanMessage):
+        if any(phrase in last_message.lower() for phrase in LOAN_LIST_PHRASES):
+            print("---LOGIC: Detected loan listing request, routing to query handler---")
+            return {"routing_decision": "goto_loan_query"}
+
+
     # CHECK 4: Income proof needed - ask for upload
     if (state.get('needs_income_proof') == True) and \
     (state.get('is_income_verified') == False) and \
@@ -780,6 +1057,7 @@ def SalesAgent(state: Loan_agent_state):
         # Present offers to user
         if state.get('offers_just_presented'):
             print("---LOGIC: Presenting loan offers to user---")
+            quotes = state.get('offer_quotes') or []
             formatted_options = []
             for i, option in enumerate(options_list, 1):
                 option_str = (
@@ -787,6 +1065,13 @@ def SalesAgent(state: Loan_agent_state):
                     f"at {option.interest_rate:.1f}% interest "
                     f"for {option.tenure_years} years"
                 )
+                if i <= len(quotes):
+                    quote = quotes[i - 1]
+                    option_str += (
+                        f" — EMI ₹{quote['monthly_emi']:,.0f}/month, "
+                        f"₹{quote['total_payable']:,.0f} in total "
+                        f"(₹{quote['total_interest']:,.0f} interest)"
+                    )
                 formatted_options.append(option_str)
             
             customer_name = state.get('customer_details', {}).get('name', 'there')
@@ -834,9 +1119,16 @@ def SalesAgent(state: Loan_agent_state):
         has_loan_keyword = any(keyword in message_lower for keyword in loan_keywords)
         
         if has_loan_keyword:
-            print("---LOGIC: Loan keyword detected, verifying intent with LLM---")
+            # Clear-cut messages are classified locally; only the ambiguous
+            # ones cost an LLM round trip.
+            intent = intent_classifier.classify(last_message)
+            print(f"---LOGIC: Loan keyword detected, intent {intent.wants_loan} "
+                  f"via {intent.tier} (confidence {intent.confidence:.2f})---")
             
-            intent_check_prompt = f"""Analyze if the user wants to apply for a loan.
+            if intent.wants_loan is not None:
+                wants_loan = intent.wants_loan
+            else:
+                intent_check_prompt = f"""Analyze if the user wants to apply for a loan.
 
 User message: "{last_message}"
 
@@ -847,10 +1139,11 @@ Important:
 
 Respond with ONLY 'YES' or 'NO'."""
             
-            intent_response = llm.invoke(intent_check_prompt).content.upper().strip()
-            print(f"---DEBUG: Intent response: '{intent_response}'---")
+                intent_response = (yield Call(llm, intent_check_prompt)).content.upper().strip()
+                print(f"---DEBUG: Intent response: '{intent_response}'---")
+                wants_loan = 'YES' in intent_response
             
-            if 'YES' in intent_response:
+            if wants_loan:
                 print("---LOGIC: User wants a loan. Asking for phone number and pin ---")
                 ask_ph_no = (
                     "Great! I'd be happy to help you with a personal loan. "
@@ -874,6 +1167,14 @@ Respond with ONLY 'YES' or 'NO'."""
     # FALLBACK: General conversation
     print("---FALLBACK: General Chat---")
     
+    cached_response = fallback_cache.get(last_message)
+    if cached_response is not None:
+        print("---FALLBACK: Served from response cache---")
+        return {
+            'messages': [AIMessage(content=cached_response)],
+            'routing_decision': 'waiting_for_user'
+        }
+    
     try:
         # Create a conversational prompt
         chat_prompt = f"""You are a friendly and helpful Tata Capital bank agent named Alex. 
@@ -884,10 +1185,11 @@ If it's a greeting, respond warmly and ask how you can help with personal loans.
 Stay professional but friendly."""
         
         # Get the LLM response - extract .content immediately
-        llm_response = llm.invoke(chat_prompt)
+        llm_response = yield Call(chat_llm, chat_prompt)
         general_response = llm_response.content  # ← CRITICAL: Extract content here!
         
         print(f"---DEBUG: Generated response: {general_response[:50]}...---")
+        fallback_cache.put(last_message, general_response)
         
         return {
             'messages': [AIMessage(content=general_response)],
@@ -916,7 +1218,9 @@ def verification_node(state: Loan_agent_state):
             "routing_decision": "goto_sales_agent"
         }
     
-    api_result = get_customer_details_tool.invoke({"phone": phone_to_check, "pin": pin_to_check})
+    # One call verifies the customer and brings back their eligible offers,
+    # so present_offers_node doesn't need another round trip.
+    api_result = yield Call(get_customer_360_tool, {"phone": phone_to_check, "pin": pin_to_check})
 
 
     if api_result.get('status') == 'Verified':
@@ -930,6 +1234,7 @@ def verification_node(state: Loan_agent_state):
             "customer_details": customer_data,
             "customer_id": customer_data['id'],
             "credit_score": customer_data['credit_score'],
+            "eligible_options": api_result.get('options'),
             "routing_decision": "goto_underwriting" # Send to the next specialist!
         }
     
@@ -949,19 +1254,56 @@ def verification_node(state: Loan_agent_state):
         }
     
 
+def quote_options(options):
+    """EMI, total payable and total interest for a list of option dicts, in one vectorized pass."""
+    emis, totals, interests = loan_math.loan_totals(
+        [opt['amount'] for opt in options],
+        [opt['interest_rate'] for opt in options],
+        [opt['tenure_years'] for opt in options],
+    )
+    return [
+        {'monthly_emi': emi, 'total_payable': total, 'total_interest': interest}
+        for emi, total, interest in zip(emis.tolist(), totals.tolist(), interests.tolist())
+    ]
+
+
 def present_offers_node(state: Loan_agent_state):
     credit_score = state.get('credit_score')
 
     if not credit_score:
         return {'routing_decision': 'goto_sales_agent'}
+
+    # Verification already fetched the eligible options via the customer 360
+    # call; their EMIs are computed locally with the same formula as /loans/quote.
+    if state.get('eligible_options') is not None:
+        if not state['eligible_options']:
+            return {'presented_options': [], 'routing_decision': 'goto_sales_agent'}
+
+        structured_options = [LoanDetails(**opt) for opt in state['eligible_options']]
+        return {
+            'presented_options': structured_options,
+            'offer_quotes': quote_options(state['eligible_options']),
+            'offers_just_presented': True,
+            'routing_decision': 'goto_sales_agent'
+            }
     
-    api_result = get_loan_options_tool.invoke({'credit_score': credit_score})
+    # Otherwise one call returns the eligible options (from the eligibility
+    # matrix when we know the customer, else by score band) with their EMIs,
+    # so the customer doesn't have to ask for them option by option.
+    api_result = yield Call(get_loan_quotes_tool, {
+        'customer_id': state.get('customer_id'),
+        'credit_score': credit_score
+    })
 
     if api_result.get('status') == 'Success':
-        raw_options = api_result['options']
+        raw_options = api_result['quotes']
         structured_options = [LoanDetails(**opt) for opt in raw_options]
         return {
             'presented_options': structured_options,
+            'offer_quotes': [
+                {key: opt[key] for key in ('monthly_emi', 'total_payable', 'total_interest')}
+                for opt in raw_options
+            ],
             'offers_just_presented': True, 
             'routing_decision': 'goto_sales_agent'
             }
@@ -977,7 +1319,16 @@ def extraction_node(state: Loan_agent_state):
     if not options_list:
         return {'routing_decision': 'goto_sales_agent'}
     
+    # Most replies ("option 2", "the second one", "the 30k one") name a single
+    # option outright; only ambiguous ones go to the LLM.
+    selection = option_parser.parse_selection(user_reply, options_list)
+    option_parser.record(selection)
+    if selection.index is not None:
+        print(f"---EXTRACTION: Parsed option {selection.index + 1} locally---")
+        return {'selected_loan': options_list[selection.index], 'routing_decision': 'goto_income_check'}
+    
     else:
+        print(f"---EXTRACTION: Asking the LLM ({selection.reason})---")
         prompt = f"""
 You are a loan selection assistant. A user was presented with the following list of loan options:
 
@@ -996,7 +1347,7 @@ Your job is to identify *exactly* which option the user selected from the list.
 Return the JSON object for *only* the selected loan.
 """
         
-        selected_loan_option = structured_llm.invoke(prompt)
+        selected_loan_option = yield Call(structured_llm, prompt)
 
         if selected_loan_option:
             return {'selected_loan': selected_loan_option, 'routing_decision': 'goto_income_check'}
@@ -1012,8 +1363,8 @@ def sanction_node(state: Loan_agent_state) -> dict:
     customer = state.get('customer_details')
     loan = state.get('selected_loan')
     amortization_data = state.get('amortization_schedule')
-    # Create a unique loan application id
-    application_id = str(uuid.uuid4())
+    # Create a unique, time-ordered loan application id (UUIDv7)
+    application_id = str(uuid7())
 
 
     # 2. Paranoia Check
@@ -1021,32 +1372,35 @@ def sanction_node(state: Loan_agent_state) -> dict:
         print("Sanction Error: Missing customer or loan data in state.")
         return {"routing_decision": "goto_sales_agent"} # Send back to SalesAgent for error
 
-    # 3. Execute Tool 1: Log the application to the DB
-    log_result = log_application_tool.invoke({
-        "application_id": application_id,
-        "customer_id": customer['id'],
-        "plan_name": loan.plan_name,
-        "amount": loan.amount,
-        "interest_rate": loan.interest_rate,
-        "tenure_years": loan.tenure_years
-    })
-    
+    # 3. Log the application to the DB and generate the PDF together: the
+    # letter only needs the application id, which is already decided above
+    log_result, letter_path = yield [
+        Call(log_application_tool, {
+            "application_id": application_id,
+            "customer_id": customer['id'],
+            "plan_name": loan.plan_name,
+            "amount": loan.amount,
+            "interest_rate": loan.interest_rate,
+            "tenure_years": loan.tenure_years
+        }),
+        Call(generate_sanction_letter_tool, {
+            "application_id": application_id,
+            "customer_name": customer['name'],
+            "amount": loan.amount,
+            "interest_rate": loan.interest_rate,
+            "tenure_years": loan.tenure_years,
+            "amortization_data": amortization_data
+        }),
+    ]
+
     if log_result.get('status') != 'success':
         print(f"Sanction Error: Failed to log application: {log_result.get('detail')}")
+        # No letter for an application that was never recorded
+        if "Error:" not in letter_path and os.path.exists(letter_path):
+            os.remove(letter_path)
         return {"routing_decision": "goto_sales_agent"}
-        
-    application_id = log_result.get('application_id')
-
-    # 4. Execute Tool 2: Generate the PDF
-    letter_path = generate_sanction_letter_tool.invoke({
-        "application_id": application_id,
-        "customer_name": customer['name'],
-        "amount": loan.amount,
-        "interest_rate": loan.interest_rate,
-        "tenure_years": loan.tenure_years,
-        "amortization_data": amortization_data
-    })
 
+    # 4. Check the PDF
     if "Error:" in letter_path:
         print(f"Sanction Error: Failed to generate PDF: {letter_path}")
         return {"routing_decision": "goto_sales_agent"}
@@ -1179,6 +1533,7 @@ def calculate_amortization_schedule_node(state: Loan_agent_state):
     print(f"---DEBUG: Loan details - Amount: ₹{loan.amount}, Rate: {loan.interest_rate}%, Tenure: {loan.tenure_years} years---")
 
     try:    
+        # Microseconds of local math: computed inline, never off the event loop
         schedule_result = calculate_amortization_schedule_tool.invoke({
             'amount': loan.amount,
             'interest_rate': loan.interest_rate,
@@ -1206,6 +1561,36 @@ def calculate_amortization_schedule_node(state: Loan_agent_state):
         return {'status': 'error', 'detail': str(e)}
     
 
+def format_loan_list(customer_id):
+    """Builds the reply for 'show all my loans' from one page of the customer's applications."""
+    if not customer_id:
+        return "I need to verify your account before I can look up your loans."
+
+    result = yield Call(list_customer_applications_tool, {'customer_id': customer_id, 'limit': LOAN_LIST_LIMIT})
+
+    if result.get('status') != 'success':
+        print(f"Loan listing failed: {result.get('detail')}")
+        return "Sorry, I couldn't fetch your loans right now. Please try again in a moment."
+
+    applications = result['applications']
+    if not applications:
+        return "You don't have any loans with Tata Capital yet."
+
+    lines = []
+    for i, application in enumerate(applications, 1):
+        applied_on = str(application['application_date'])[:10]
+        lines.append(
+            f"  {i}. {application['plan_name']} - ₹{application['amount']:,.0f} "
+            f"at {application['interest_rate']}% for {application['tenure_years']} years "
+            f"(applied {applied_on})"
+        )
+
+    response = f"Here are your loans:\n\n{chr(10).join(lines)}"
+    if result.get('has_more'):
+        response += f"\n\nShowing your {LOAN_LIST_LIMIT} most recent loans."
+    return response
+
+
 def loan_query_handler_node(state: Loan_agent_state) -> dict:
     """
     Handles queries about existing loans (amortization, payment details, etc.)
@@ -1213,6 +1598,13 @@ def loan_query_handler_node(state: Loan_agent_state) -> dict:
     print("---NODE: LoanQueryHandlerNode---")
     
     last_message = state['messages'][-1].content.lower()
+
+    # Listing every loan the customer has is a single bounded API call
+    if any(phrase in last_message for phrase in LOAN_LIST_PHRASES):
+        return {
+            'messages': [AIMessage(content=(yield from format_loan_list(state.get('customer_id'))))],
+            'routing_decision': 'waiting_for_user'
+        }
     
     # Check what the user is asking about
     query_keywords = {
@@ -1231,7 +1623,6 @@ def loan_query_handler_node(state: Loan_agent_state) -> dict:
     # Get the amortization data
     schedule_data = state.get('amortization_schedule')
     loan = state.get('selected_loan')
-    total_months = loan.tenure_years * 12
     
     if not schedule_data or not loan:
         response = "I don't have loan details available. Please complete your application first."
@@ -1239,6 +1630,8 @@ def loan_query_handler_node(state: Loan_agent_state) -> dict:
             'messages': [AIMessage(content=response)],
             'routing_decision': 'waiting_for_user'
         }
+
+    total_months = loan.tenure_years * 12
     
     # Generate response based on query type
     if query_type == 'schedule':
@@ -1291,7 +1684,7 @@ Loan Details: {context}
 
 Provide a clear, friendly response."""
         
-        response = llm.invoke(prompt).content
+        response = (yield Call(chat_llm, prompt)).content
     
     return {
         'messages': [AIMessage(content=response)],
@@ -1321,18 +1714,34 @@ def add_customer_node(state: Loan_agent_state):
     print(f"Extracting customer details from: {last_message}")
     
     try:
-        # Extract customer data using LLM
-        user_details = customer_data_llm.invoke(last_message)
+        # Read what the rules can, and ask the LLM only for the rest
+        parsed = registration_parser.parse(last_message)
+        details = dict(parsed.fields)
+        if parsed.missing:
+            print(f"---REGISTRATION: Asking the LLM for {', '.join(parsed.missing)}---")
+            extraction_prompt = (
+                f"Extract these fields from the customer's registration message: {', '.join(parsed.missing)}. "
+                f"If no credit score is given, use {registration_parser.DEFAULT_CREDIT_SCORE}.\n\n"
+                f"Message: \"{last_message}\""
+            )
+            extracted = yield Call(partial_customer_data_llm(parsed.missing), extraction_prompt)
+            details.update(extracted.model_dump())
+        else:
+            print("---REGISTRATION: All details parsed locally---")
+        user_details = AddNewCustomer(**details)
         
         print(f"Extracted details: Name={user_details.customer_name}, Phone={user_details.customer_phone}, Address={user_details.customer_address}")
         
+        # New registrants have no loans yet, so the limit depends on the score alone
+        pre_approved_limit = int(loan_math.pre_approved_limit_for(user_details.credit_score))
+        
         # Add customer to database
-        add_result = add_new_customer_tool.invoke({
+        add_result = yield Call(add_new_customer_tool, {
             'name': user_details.customer_name,
             'phone': user_details.customer_phone,
             'address': user_details.customer_address,
             'credit_score': user_details.credit_score,
-            'pre_approved_limit': 50000,
+            'pre_approved_limit': pre_approved_limit,
             'pin': user_details.pin
         })
         
@@ -1364,7 +1773,7 @@ def add_customer_node(state: Loan_agent_state):
                     'name': user_details.customer_name,
                     'phone': user_details.customer_phone,
                     'credit_score': user_details.credit_score,
-                    'pre_approved_limit': 50000
+                    'pre_approved_limit': pre_approved_limit
                 },
                 'awaiting_registration_details': False,
                 'routing_decision': 'goto_underwriting'  # Go get loan options!
@@ -1442,120 +1851,156 @@ def registration_router(state: Loan_agent_state) -> str:
 
 
 # --- 2. Assemble the Graph ---
+def build_workflow():
+    """The uncompiled agent graph; get_app() and get_async_app() compile it with their checkpointers."""
+    from langgraph.graph import StateGraph, END
+
+    print("Assembling the agent graph...")
+    workflow = StateGraph(Loan_agent_state)
+
+    # --- 3. Add All Nodes ---
+    workflow.add_node("sales_agent", graph_node(SalesAgent))
+    workflow.add_node("verify_customer", graph_node(verification_node))
+    workflow.add_node("present_offers", graph_node(present_offers_node))
+    workflow.add_node("extract_choice", graph_node(extraction_node))
+    workflow.add_node("check_income_policy", graph_node(income_check_node))
+    workflow.add_node("verify_uploaded_income", graph_node(verify_income_node))
+    workflow.add_node("generate_sanction", graph_node(sanction_node))
+    workflow.add_node("calculate_amortization", graph_node(calculate_amortization_schedule_node))
+    workflow.add_node("handle_loan_query", graph_node(loan_query_handler_node))
+    workflow.add_node("register_customer", graph_node(add_customer_node))
+
+
+    # --- 4. Set the Entry Point ---
+    # All conversations start with the SalesAgent.
+    workflow.set_entry_point("sales_agent")
+
+    # --- 5. Add All Edges ---
+
+    # The main "Hub" router (from the SalesAgent)
+    workflow.add_conditional_edges(
+        "sales_agent",
+        sales_agent_router,
+        {
+            "waiting_for_user": END,  # Stop and wait for the next human input
+            "goto_verification": "verify_customer",
+            "goto_registration": "register_customer",
+            "goto_extraction": "extract_choice",
+            "goto_income_verification": "verify_uploaded_income",
+            "goto_loan_query": "handle_loan_query",
+            "end_conversation": END # The process is finished
+        }
+    )
+
+    # Router for the VerificationAgent
+    workflow.add_conditional_edges(
+        "verify_customer",
+        verification_router,
+        {
+            "goto_underwriting": "present_offers", # Success
+            "goto_sales_agent": "sales_agent"     # Failure
+        }
+    )
+
+    # Router for the ExtractionAgent
+    workflow.add_conditional_edges(
+        "extract_choice",
+        extraction_router,
+        {
+            "goto_income_check": "check_income_policy", # Success
+            "goto_sales_agent": "sales_agent"        # Failure
+        }
+    )
+
+    # Router for the IncomeCheckAgent (Policy Check)
+    workflow.add_conditional_edges(
+        "check_income_policy",
+        income_check_router,
+        {
+            "goto_sanctioning": "calculate_amortization", # Approved!
+            "waiting_for_user" : END,
+            "goto_sales_agent": "sales_agent"        # Needs upload or is rejected
+        }
+    )
+
+    # Router for the VerifyIncomeNode (File Check)
+    workflow.add_conditional_edges(
+        "verify_uploaded_income",
+        income_verify_router,
+        {
+            "goto_sanctioning": "calculate_amortization", # File found, approved!
+            "goto_sales_agent": "sales_agent"        # File not found
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "register_customer",
+        registration_router,
+        {
+            "goto_underwriting": "present_offers",  # Success - get loan options
+            "goto_sales_agent": "sales_agent",      # Failure - back to chat
+            "waiting_for_user": END                 # Waiting for more info
+        }
+    )
 
-print("Assembling the agent graph...")
-workflow = StateGraph(Loan_agent_state)
-
-# --- 3. Add All Nodes ---
-workflow.add_node("sales_agent", SalesAgent)
-workflow.add_node("verify_customer", verification_node)
-workflow.add_node("present_offers", present_offers_node)
-workflow.add_node("extract_choice", extraction_node)
-workflow.add_node("check_income_policy", income_check_node)
-workflow.add_node("verify_uploaded_income", verify_income_node)
-workflow.add_node("generate_sanction", sanction_node)
-workflow.add_node("calculate_amortization", calculate_amortization_schedule_node)
-workflow.add_node("handle_loan_query", loan_query_handler_node)
-workflow.add_node("register_customer", add_customer_node)
-
-
-# --- 4. Set the Entry Point ---
-# All conversations start with the SalesAgent.
-workflow.set_entry_point("sales_agent")
-
-# --- 5. Add All Edges ---
-
-# The main "Hub" router (from the SalesAgent)
-workflow.add_conditional_edges(
-    "sales_agent",
-    sales_agent_router,
-    {
-        "waiting_for_user": END,  # Stop and wait for the next human input
-        "goto_verification": "verify_customer",
-        "goto_registration": "register_customer",
-        "goto_extraction": "extract_choice",
-        "goto_income_verification": "verify_uploaded_income",
-        "goto_loan_query": "handle_loan_query",
-        "end_conversation": END # The process is finished
-    }
-)
+    # Simple edges for nodes that have only one possible next step
+    workflow.add_edge("present_offers", "sales_agent")
+    workflow.add_edge("generate_sanction", "sales_agent")
+    workflow.add_edge("calculate_amortization", "generate_sanction")
+    workflow.add_edge("handle_loan_query", "sales_agent")
 
-# Router for the VerificationAgent
-workflow.add_conditional_edges(
-    "verify_customer",
-    verification_router,
-    {
-        "goto_underwriting": "present_offers", # Success
-        "goto_sales_agent": "sales_agent"     # Failure
-    }
-)
+    return workflow
 
-# Router for the ExtractionAgent
-workflow.add_conditional_edges(
-    "extract_choice",
-    extraction_router,
-    {
-        "goto_income_check": "check_income_policy", # Success
-        "goto_sales_agent": "sales_agent"        # Failure
-    }
-)
 
-# Router for the IncomeCheckAgent (Policy Check)
-workflow.add_conditional_edges(
-    "check_income_policy",
-    income_check_router,
-    {
-        "goto_sanctioning": "calculate_amortization", # Approved!
-        "waiting_for_user" : END,
-        "goto_sales_agent": "sales_agent"        # Needs upload or is rejected
-    }
-)
+# --- 6. Compile ---
+_app = None
+_app_lock = threading.Lock()
 
-# Router for the VerifyIncomeNode (File Check)
-workflow.add_conditional_edges(
-    "verify_uploaded_income",
-    income_verify_router,
-    {
-        "goto_sanctioning": "calculate_amortization", # File found, approved!
-        "goto_sales_agent": "sales_agent"        # File not found
-    }
-)
 
-workflow.add_conditional_edges(
-    "register_customer",
-    registration_router,
-    {
-        "goto_underwriting": "present_offers",  # Success - get loan options
-        "goto_sales_agent": "sales_agent",      # Failure - back to chat
-        "waiting_for_user": END                 # Waiting for more info
-    }
-)
+def get_app():
+    """The compiled graph with its SQLite checkpointer (memory.db), built on first use."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
 
-# Simple edges for nodes that have only one possible next step
-workflow.add_edge("present_offers", "sales_agent")
-workflow.add_edge("generate_sanction", "sales_agent")
-workflow.add_edge("calculate_amortization", "generate_sanction")
-workflow.add_edge("handle_loan_query", "sales_agent")
+            conn = sqlite3.connect("memory.db", check_same_thread=False)
+            _app = build_workflow().compile(checkpointer=SqliteSaver(conn=conn))
+            print("Graph compiled successfully.")
+        return _app
 
 
-conn = sqlite3.connect("memory.db", check_same_thread=False)
+def __getattr__(name):
+    # `from Loan_agent import app` and `Loan_agent.app` keep working
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 2. Instantiate the SqliteSaver directly with the connection
-memory = SqliteSaver(conn=conn)
+# The same graph for asyncio callers. Its nodes await the LLM and API instead
+# of blocking, so one process can run many conversations concurrently:
+#     async_app = await get_async_app()
+#     final_state = await async_app.ainvoke(input_data, config=config)
+# The async checkpointer (same memory.db) is bound to the event loop it was
+# created on, so there is one compiled app per running loop.
+_async_apps = weakref.WeakKeyDictionary()
+_async_app_locks = weakref.WeakKeyDictionary()
 
-# 3. Now, compile the app with the *real* saver object
-app = workflow.compile(checkpointer=memory)
 
-# Create a session thread 
-config = {'configurable': {'thread_id': 2}}
+async def get_async_app():
+    loop = asyncio.get_running_loop()
+    # Concurrent first callers on a loop wait for one connection instead of each opening their own
+    async with _async_app_locks.setdefault(loop, asyncio.Lock()):
+        if loop not in _async_apps:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
-print("Graph compiled successfully.")
+            async_memory = AsyncSqliteSaver(conn=await aiosqlite.connect("memory.db"))
+            _async_apps[loop] = build_workflow().compile(checkpointer=async_memory)
+    return _async_apps[loop]
 
 # make a runnable chatbot with while loop
 
-print("Graph compiled successfully.")
-print("Chatbot started! Type 'exit' to quit.\n")
-
 """
 # Create a session thread 
 config = {'configurable': {'thread_id': 14}}
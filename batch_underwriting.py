@@ -0,0 +1,249 @@
+"""
+Batch underwriting for campaign planning.
+
+For every customer, evaluates every plan in loan_options: credit-score band,
+the pre-approved-limit policy from income_check_node (instant / income proof /
+ineligible) and the monthly EMI. Customers are streamed from a server-side
+cursor in chunks, the eligibility matrix for a chunk is computed with NumPy
+broadcasting, and the rows are COPYed into underwriting_results under a new
+run_id. The COPY text for a chunk is assembled as one NumPy byte matrix too
+(see _to_copy_buffer; benchmarks/bench_copy_buffer.py compares it with
+formatting row by row).
+
+    python batch_underwriting.py --chunk-size 200000
+    python batch_underwriting.py --include-ineligible --keep-runs 3
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+
+import loan_math
+from db_config import get_connection
+from db_migrations import run_migrations
+from id_generator import uuid7
+
+# eligibility code -> text written to underwriting_results
+CODE_LABELS = np.array(
+    [''] + [loan_math.ELIGIBILITY_LABELS[code] for code in sorted(loan_math.ELIGIBILITY_LABELS)],
+    dtype=object
+)
+
+
+# --- 1. Loading ---
+def load_plans(conn):
+    """Returns the plan catalog as a dict of NumPy arrays, one entry per column."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, min_score, max_score, amount, interest_rate, tenure_years FROM loan_options ORDER BY id"
+        )
+        rows = cursor.fetchall()
+
+    ids, min_scores, max_scores, amounts, rates, tenures = zip(*rows) if rows else ([],) * 6
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'min_score': np.array(min_scores, dtype=np.int32),
+        'max_score': np.array(max_scores, dtype=np.int32),
+        'amount': np.array(amounts, dtype=np.int64),
+        'interest_rate': np.array(rates, dtype=np.float64),
+        'tenure_years': np.array(tenures, dtype=np.int32),
+    }
+
+
+def iter_customer_chunks(conn, chunk_size):
+    """
+    Yields (ids, credit_scores, pre_approved_limits) arrays of up to chunk_size
+    customers, read through a named (server-side) cursor so only one chunk is
+    ever held in memory.
+    """
+    with conn.cursor(name="underwriting_customers") as cursor:
+        cursor.execute("SELECT id, credit_score, pre_approved_limit FROM customers ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = np.array(rows, dtype=np.int64)
+            yield chunk[:, 0], chunk[:, 1], chunk[:, 2]
+
+
+# --- 2. Evaluation ---
+def underwrite_chunk(customer_ids, credit_scores, limits, plans, include_ineligible=False):
+    """
+    Returns parallel arrays (customer_id, plan_id, code, emi, total_payable) for
+    every qualifying (instant or income proof) pair in the chunk; with
+    include_ineligible, for every in-band pair.
+    """
+    codes = loan_math.eligibility_matrix(
+        credit_scores, limits, plans['min_score'], plans['max_score'], plans['amount']
+    )
+    if include_ineligible:
+        keep = codes != loan_math.NOT_IN_BAND
+    else:
+        keep = (codes == loan_math.INSTANT) | (codes == loan_math.INCOME_PROOF)
+
+    customer_index, plan_index = np.nonzero(keep)
+    return (
+        customer_ids[customer_index],
+        plans['id'][plan_index],
+        codes[customer_index, plan_index],
+        plans['emi'][plan_index],
+        plans['total_payable'][plan_index],
+    )
+
+
+# COPY text is built for the whole chunk at once as a (rows, width) uint8
+# matrix. Each field is padded with NUL bytes, which never occur in the data,
+# so dropping every NUL leaves the rows exactly as they'd be written one by one.
+def _ascii_constant(text, rows):
+    return np.broadcast_to(np.frombuffer(text.encode(), dtype=np.uint8), (rows, len(text)))
+
+
+def _ascii_strings(values):
+    """A bytes ('S') array as its NUL-padded characters."""
+    values = np.ascontiguousarray(values)
+    return values.view(np.uint8).reshape(len(values), values.dtype.itemsize)
+
+
+def _ascii_digits(values):
+    """Non-negative integers as decimal digits, leading zeros as NULs."""
+    values = np.asarray(values, dtype=np.int64)
+    width = len(str(int(values.max())))
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (values[:, None] // powers % 10 + ord('0')).astype(np.uint8)
+    digits[:, :-1][values[:, None] < powers[:-1]] = 0
+    return digits
+
+
+def _to_copy_buffer(run_id, customer_ids, plan_ids, codes, emis, totals):
+    rows = len(customer_ids)
+    if not rows:
+        return io.StringIO()
+    # Everything after the customer id depends only on the plan and the
+    # eligibility code, so each distinct tail is formatted once per chunk.
+    keys = plan_ids.astype(np.int64) * len(CODE_LABELS) + codes
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    tails = np.array([
+        f"\t{plan_ids[i]}\t{CODE_LABELS[codes[i]]}\t{emis[i]:.2f}\t{totals[i]:.2f}\n".encode() for i in first
+    ])
+    matrix = np.hstack([
+        _ascii_constant(f"{run_id}\t", rows),
+        _ascii_digits(customer_ids),
+        _ascii_strings(tails[inverse.ravel()]),
+    ])
+    return io.StringIO(matrix[matrix != 0].tobytes().decode('ascii'))
+
+
+# --- 3. Run bookkeeping ---
+def start_run(conn):
+    run_id = uuid7()
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO underwriting_runs (run_id) VALUES (%s)", (str(run_id),))
+    conn.commit()
+    return run_id
+
+
+def finish_run(conn, run_id, customers, result_rows, keep_runs, abandoned_after_hours):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "UPDATE underwriting_runs SET finished_at = NOW(), customers = %s, result_rows = %s WHERE run_id = %s",
+            (customers, result_rows, str(run_id))
+        )
+        if keep_runs:
+            # Results of older runs cascade away with their run row. Runs still
+            # in progress (another job overlapping this one) are never touched.
+            cursor.execute(
+                """
+                DELETE FROM underwriting_runs
+                WHERE finished_at IS NOT NULL
+                  AND run_id NOT IN (
+                    SELECT run_id FROM underwriting_runs
+                    WHERE finished_at IS NOT NULL
+                    ORDER BY started_at DESC LIMIT %s
+                )
+                """,
+                (keep_runs,)
+            )
+            # Unfinished runs this old were abandoned (crashed or killed jobs)
+            cursor.execute(
+                """
+                DELETE FROM underwriting_runs
+                WHERE finished_at IS NULL AND started_at < NOW() - make_interval(hours => %s)
+                """,
+                (abandoned_after_hours,)
+            )
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Customers evaluated and COPYed per batch")
+    parser.add_argument("--include-ineligible", action="store_true",
+                        help="Also record in-band plans whose amount exceeds 2x the pre-approved limit")
+    parser.add_argument("--keep-runs", type=int, default=0,
+                        help="Delete all but the N most recent finished runs afterwards (0 keeps everything)")
+    parser.add_argument("--abandoned-after-hours", type=int, default=24,
+                        help="With --keep-runs, also delete unfinished runs started more than this many hours ago")
+    args = parser.parse_args()
+
+    # One connection streams customers, the other writes, so each chunk's
+    # COPY can commit without closing the server-side cursor.
+    read_conn = get_connection()
+    write_conn = get_connection()
+    try:
+        run_migrations(write_conn)
+        plans = load_plans(read_conn)
+        if not len(plans['id']):
+            print("loan_options is empty (run loan_setup_db.py first); nothing to underwrite.")
+            return
+
+        # EMI depends only on the plan, so it's computed once per plan.
+        plans['emi'], plans['total_payable'], _ = loan_math.loan_totals(
+            plans['amount'], plans['interest_rate'], plans['tenure_years']
+        )
+
+        run_id = start_run(write_conn)
+        print(f"Underwriting run {run_id}: {len(plans['id'])} plans, chunks of {args.chunk_size:,} customers...")
+
+        started = time.perf_counter()
+        total_customers = total_rows = 0
+        code_counts = np.zeros(len(CODE_LABELS), dtype=np.int64)
+
+        for customer_ids, credit_scores, limits in iter_customer_chunks(read_conn, args.chunk_size):
+            customer_col, plan_col, code_col, emi_col, total_col = underwrite_chunk(
+                customer_ids, credit_scores, limits, plans, args.include_ineligible
+            )
+
+            with write_conn.cursor() as cursor:
+                cursor.copy_expert(
+                    "COPY underwriting_results (run_id, customer_id, plan_id, eligibility, monthly_emi, total_payable) "
+                    "FROM STDIN",
+                    _to_copy_buffer(run_id, customer_col, plan_col, code_col, emi_col, total_col)
+                )
+            write_conn.commit()
+
+            total_customers += len(customer_ids)
+            total_rows += len(customer_col)
+            code_counts += np.bincount(code_col, minlength=len(code_counts))
+            elapsed = time.perf_counter() - started
+            print(f"  {total_customers:>12,} customers, {total_rows:>12,} rows "
+                  f"({total_customers / elapsed:,.0f} customers/s)")
+
+        read_conn.commit()
+        finish_run(write_conn, run_id, total_customers, total_rows, args.keep_runs, args.abandoned_after_hours)
+
+        elapsed = time.perf_counter() - started
+        breakdown = ", ".join(
+            f"{label}={code_counts[code]:,}" for code, label in loan_math.ELIGIBILITY_LABELS.items()
+        )
+        print(f"Done: {total_customers:,} customers -> {total_rows:,} rows ({breakdown}) in {elapsed:.1f}s.")
+    except Exception:
+        write_conn.rollback()
+        raise
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+
+if __name__ == "__main__":
+    main()
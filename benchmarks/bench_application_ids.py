@@ -0,0 +1,109 @@
+"""
+Benchmark: random text UUIDv4 keys vs time-ordered native UUIDv7 keys.
+
+Inserts the same number of applications2-shaped rows into scratch tables
+that differ only in how the primary key is generated and stored, then
+reports insert throughput and primary-key index size for each.
+
+    python benchmarks/bench_application_ids.py --rows 1000000 --batch-size 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_config import get_connection
+from id_generator import uuid7
+
+# (label, key column type, key generator)
+SCHEMES = [
+    ("text_uuid4", "TEXT", lambda: str(uuid.uuid4())),
+    ("uuid_uuid4", "UUID", lambda: str(uuid.uuid4())),
+    ("uuid_uuid7", "UUID", lambda: str(uuid7())),
+]
+
+
+def run_scheme(conn, label, key_type, make_id, rows, batch_size):
+    table = f"bench_ids_{label}"
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"""
+        CREATE TABLE {table} (
+            application_id {key_type} PRIMARY KEY,
+            customer_id INTEGER NOT NULL,
+            plan_name TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            interest_rate REAL NOT NULL,
+            tenure_years INTEGER NOT NULL,
+            application_date TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """)
+    conn.commit()
+
+    started = time.perf_counter()
+    inserted = 0
+    with conn.cursor() as cursor:
+        while inserted < rows:
+            batch = [
+                (make_id(), (inserted + i) % 100_000, "Prime Loan", 100000, 6.0, 5)
+                for i in range(min(batch_size, rows - inserted))
+            ]
+            execute_values(
+                cursor,
+                f"INSERT INTO {table} (application_id, customer_id, plan_name, amount, interest_rate, tenure_years) VALUES %s",
+                batch,
+                page_size=batch_size
+            )
+            conn.commit()
+            inserted += len(batch)
+    elapsed = time.perf_counter() - started
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_relation_size(%s), pg_relation_size(%s)",
+                       (f"{table}_pkey", table))
+        index_bytes, heap_bytes = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {table}")
+    conn.commit()
+
+    return {
+        "scheme": label,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1),
+        "pkey_index_mb": round(index_bytes / 1024 / 1024, 2),
+        "heap_mb": round(heap_bytes / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        results = []
+        for label, key_type, make_id in SCHEMES:
+            print(f"Running {label} ({args.rows:,} rows)...")
+            result = run_scheme(conn, label, key_type, make_id, args.rows, args.batch_size)
+            print(f"  {result['rows_per_second']:>12,.0f} rows/s   pkey index {result['pkey_index_mb']:>8.2f} MB")
+            results.append(result)
+    finally:
+        conn.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: building batch_underwriting's COPY text.
+
+Generates one synthetic chunk of underwriting results (random customers
+against a random plan catalog, EMIs from loan_math as in a real run) and
+times, over several runs:
+
+- rows:   the previous approach, one f-string per row written to a StringIO
+- matrix: batch_underwriting._to_copy_buffer, which formats each distinct
+          plan/eligibility tail once and assembles the whole chunk as one
+          NumPy byte matrix
+
+Both must produce identical text; the benchmark stops if they don't.
+No database is needed.
+
+    python benchmarks/bench_copy_buffer.py --rows 1000000 --runs 5
+    python benchmarks/bench_copy_buffer.py --rows 200000 --output results/copy_buffer.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import loan_math
+from batch_underwriting import CODE_LABELS, _to_copy_buffer
+from id_generator import uuid7
+from metrics import summarize
+
+
+def row_by_row(run_id, customer_ids, plan_ids, codes, emis, totals):
+    labels = CODE_LABELS[codes]
+    buffer = io.StringIO()
+    run = str(run_id)
+    for row in zip(customer_ids.tolist(), plan_ids.tolist(), labels, emis.tolist(), totals.tolist()):
+        buffer.write(f"{run}\t{row[0]}\t{row[1]}\t{row[2]}\t{row[3]:.2f}\t{row[4]:.2f}\n")
+    buffer.seek(0)
+    return buffer
+
+
+def synthetic_chunk(rows, plans, seed):
+    """Arrays shaped like underwrite_chunk's output for `rows` (customer, plan) pairs."""
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1, 100, plans) * 10_000
+    rates = rng.uniform(9, 24, plans).round(2)
+    tenures = rng.integers(1, 8, plans)
+    emi, total_payable, _ = loan_math.loan_totals(amounts, rates, tenures)
+
+    plan_index = rng.integers(0, plans, rows)
+    return (
+        rng.integers(1, 50_000_000, rows),
+        np.arange(1, plans + 1)[plan_index],
+        rng.choice([loan_math.INSTANT, loan_math.INCOME_PROOF], rows).astype(np.int8),
+        emi[plan_index],
+        total_payable[plan_index],
+    )
+
+
+def time_ms(build, run_id, chunk):
+    started = time.perf_counter()
+    text = build(run_id, *chunk).getvalue()
+    return (time.perf_counter() - started) * 1000, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Result rows in the chunk")
+    parser.add_argument("--plans", type=int, default=40, help="Plans in the synthetic catalog")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    run_id = uuid7()
+    chunk = synthetic_chunk(args.rows, args.plans, args.seed)
+
+    samples = {"rows": [], "matrix": []}
+    for run in range(args.runs):
+        rows_ms, expected = time_ms(row_by_row, run_id, chunk)
+        matrix_ms, actual = time_ms(_to_copy_buffer, run_id, chunk)
+        if actual != expected:
+            sys.exit("The NumPy COPY buffer differs from the row-by-row one")
+        samples["rows"].append(rows_ms)
+        samples["matrix"].append(matrix_ms)
+        print(f"  run {run + 1}: rows {rows_ms:>9.1f} ms   matrix {matrix_ms:>9.1f} ms")
+
+    results = {
+        "rows": args.rows,
+        "bytes": len(expected),
+        "row_by_row_ms": summarize(samples["rows"]),
+        "numpy_matrix_ms": summarize(samples["matrix"]),
+    }
+    speedup = results["row_by_row_ms"]["p50"] / results["numpy_matrix_ms"]["p50"]
+    results["speedup_p50"] = round(speedup, 2)
+
+    for label, key in (("row by row", "row_by_row_ms"), ("numpy matrix", "numpy_matrix_ms")):
+        p50 = results[key]["p50"]
+        print(f"{label:>13}: p50 {p50:8.1f} ms ({args.rows / p50 * 1000:,.0f} rows/s)")
+    print(f"Speedup at p50: {speedup:.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
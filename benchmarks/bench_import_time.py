@@ -0,0 +1,96 @@
+"""
+Benchmark: cold-start cost of the agent module.
+
+Each run starts a fresh interpreter (so nothing is cached in sys.modules)
+and times, separately:
+
+- import:  `import Loan_agent`
+- get_app: building the Gemini client wrapper, graph and checkpointer on
+           first use (Loan_agent.get_app())
+
+It also runs `python -X importtime` once and lists the slowest modules
+imported by `import Loan_agent`, to show what a cold start still pays for.
+
+    python benchmarks/bench_import_time.py --runs 10
+    python benchmarks/bench_import_time.py --runs 10 --skip-app --output results/import.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from metrics import summarize
+
+TIMING_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import Loan_agent
+imported = time.perf_counter()
+if {build_app}:
+    Loan_agent.get_app()
+built = time.perf_counter()
+print("BENCH " + json.dumps({{"import_ms": (imported - started) * 1000, "get_app_ms": (built - imported) * 1000}}))
+"""
+
+
+def run_once(build_app):
+    output = subprocess.run(
+        [sys.executable, "-c", TIMING_SCRIPT.format(build_app=build_app)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith("BENCH "))
+    return json.loads(line[len("BENCH "):])
+
+
+def slowest_imports(top):
+    """(cumulative microseconds, module) of the slowest imports, from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import Loan_agent"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), module))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list")
+    parser.add_argument("--skip-app", action="store_true", help="Time the import only, not get_app()")
+    parser.add_argument("--output", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    samples = []
+    for run in range(args.runs):
+        samples.append(run_once(build_app=not args.skip_app))
+        print(f"  run {run + 1}: import {samples[-1]['import_ms']:>8.1f} ms   get_app {samples[-1]['get_app_ms']:>8.1f} ms")
+
+    results = {
+        "import_ms": summarize([s["import_ms"] for s in samples]),
+        "get_app_ms": summarize([s["get_app_ms"] for s in samples]),
+        "slowest_imports": [{"module": module, "cumulative_ms": round(us / 1000, 1)} for us, module in slowest_imports(args.top)],
+    }
+
+    print(f"\nimport Loan_agent: p50 {results['import_ms']['p50']:.1f} ms, max {results['import_ms']['max']:.1f} ms")
+    if not args.skip_app:
+        print(f"get_app():         p50 {results['get_app_ms']['p50']:.1f} ms, max {results['get_app_ms']['max']:.1f} ms")
+    print("\nSlowest imports (cumulative):")
+    for row in results["slowest_imports"]:
+        print(f"  {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+HTTP load test for server.py.
+
+Drives /crm/verify, /loans/options, /applications/log and /add_customer with
+a configurable request mix, concurrency cap and (optionally) a fixed Poisson
+arrival rate. Reports throughput, p50/p95/p99 latency, error rates and the
+server's DB pool wait time, and saves everything as JSON so runs can be
+compared between commits.
+
+    # start server.py and run 60s at 200 req/s, at most 64 in flight
+    python benchmarks/loadtest.py --start-server --duration 60 --rate 200 --concurrency 64
+
+    # closed loop: 32 workers as fast as they can go, custom mix
+    python benchmarks/loadtest.py --concurrency 32 --mix verify=70,options=20,log=8,add_customer=2
+
+    # compare two saved runs
+    python benchmarks/loadtest.py --compare results/before.json results/after.json
+
+Note: 'log' and 'add_customer' write real rows. Point it at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from metrics import summarize
+
+DEFAULT_MIX = "verify=60,options=25,log=10,add_customer=5"
+
+# The mock customers created by setup_postgres_db.py
+KNOWN_CUSTOMERS = [
+    ('9876543210', '1234'), ('1234567890', '5678'), ('5555544444', '4321'),
+    ('8888899999', '8765'), ('7777766666', '1111'), ('6666655555', '2222'),
+    ('9999911111', '3333'), ('3333322222', '4444'), ('2222211111', '5555'),
+    ('4444455555', '6666'),
+]
+# Share of /crm/verify calls made for numbers that aren't registered
+UNKNOWN_PHONE_RATE = 0.3
+# Statuses that are a correct answer, not an error, for each endpoint
+EXPECTED_STATUSES = {
+    "verify": {200, 404},
+    "options": {200},
+    "log": {200},
+    "add_customer": {200},
+}
+
+
+# --- 1. Request Builders ---
+class Workload:
+    def __init__(self, rng, customers):
+        self.rng = rng
+        self.customers = customers  # [(phone, pin, customer_id)]
+        self.new_customer_counter = 0
+
+    def verify(self):
+        if self.rng.random() < UNKNOWN_PHONE_RATE or not self.customers:
+            phone = f"59{self.rng.randint(0, 99_999_999):08d}"
+            pin = f"{self.rng.randint(0, 9999):04d}"
+        else:
+            phone, pin, _ = self.rng.choice(self.customers)
+        return "GET", "/crm/verify", {"params": {"phone": phone, "pin": pin}}
+
+    def options(self):
+        return "GET", "/loans/options", {"params": {"credit_score": self.rng.randint(600, 900)}}
+
+    def log(self):
+        _, _, customer_id = self.rng.choice(self.customers)
+        payload = {
+            "customer_id": customer_id,
+            "plan_name": "Load Test Plan",
+            "amount": self.rng.choice([5000, 10000, 25000, 50000]),
+            "interest_rate": 9.5,
+            "tenure_years": self.rng.randint(1, 5),
+        }
+        return "POST", "/applications/log", {"json": payload}
+
+    def add_customer(self):
+        # 58xxxxxxxx is used by neither the mock data nor seed_data.py
+        self.new_customer_counter += 1
+        suffix = (int(time.time() * 1000) + self.new_customer_counter) % 100_000_000
+        payload = {
+            "customer_name": "Load Test User",
+            "customer_phone": f"58{suffix:08d}",
+            "customer_address": "1 Test Street, Bangalore",
+            "pre_approved_limit": 50000,
+            "credit_score": self.rng.randint(600, 900),
+            "pin": f"{self.rng.randint(0, 9999):04d}",
+        }
+        return "POST", "/add_customer", {"json": payload}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in EXPECTED_STATUSES:
+            raise ValueError(f"Unknown endpoint '{name}' in --mix")
+        weights[name] = float(weight)
+    return weights
+
+
+# --- 2. The Runner ---
+async def discover_customers(client):
+    """Verifies the mock customers once to learn their ids (needed for /applications/log)."""
+    customers = []
+    for phone, pin in KNOWN_CUSTOMERS:
+        response = await client.get("/crm/verify", params={"phone": phone, "pin": pin})
+        if response.status_code == 200:
+            customers.append((phone, pin, response.json()["data"]["id"]))
+    return customers
+
+
+async def run_load(args):
+    weights = parse_mix(args.mix)
+    names, cumulative = list(weights), list(weights.values())
+    rng = random.Random(args.seed)
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    errors = defaultdict(int)
+    in_flight = asyncio.Semaphore(args.concurrency)
+    dropped = 0
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        customers = await discover_customers(client)
+        if not customers:
+            print("Warning: no mock customers verified; 'log' requests are disabled.")
+            weights.pop("log", None)
+            names, cumulative = list(weights), list(weights.values())
+
+        workload = Workload(rng, customers)
+        await client.post("/metrics/reset")
+
+        async def one_request():
+            name = rng.choices(names, cumulative)[0]
+            method, path, kwargs = getattr(workload, name)()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                statuses[name][response.status_code] += 1
+                if response.status_code not in EXPECTED_STATUSES[name]:
+                    errors[name] += 1
+            except httpx.HTTPError as e:
+                statuses[name][type(e).__name__] += 1
+                errors[name] += 1
+            finally:
+                latencies[name].append((time.perf_counter() - started) * 1000)
+                in_flight.release()
+
+        print(f"Running for {args.duration}s: mix={args.mix}, concurrency={args.concurrency}, "
+              f"rate={'closed loop' if not args.rate else f'{args.rate}/s'}")
+
+        tasks = set()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        next_arrival = started
+
+        while time.perf_counter() < deadline:
+            if args.rate:
+                # Open model: Poisson arrivals. If every slot is busy the
+                # arrival is dropped and counted, rather than queued.
+                next_arrival += rng.expovariate(args.rate)
+                await asyncio.sleep(max(0, next_arrival - time.perf_counter()))
+                if in_flight.locked():
+                    dropped += 1
+                    continue
+                await in_flight.acquire()
+            else:
+                await in_flight.acquire()
+
+            task = asyncio.create_task(one_request())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        server_metrics = (await client.get("/metrics")).json()
+
+    per_endpoint = {}
+    all_latencies = []
+    for name in names:
+        count = len(latencies[name])
+        all_latencies.extend(latencies[name])
+        per_endpoint[name] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2),
+            "error_rate": round(errors[name] / count, 4) if count else 0.0,
+            "statuses": {str(k): v for k, v in statuses[name].items()},
+            "latency_ms": summarize(latencies[name]),
+        }
+
+    total = len(all_latencies)
+    histograms = server_metrics.get("histograms", {})
+    return {
+        "overall": {
+            "requests": total,
+            "duration_s": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+            "dropped_arrivals": dropped,
+            "latency_ms": summarize(all_latencies),
+        },
+        "endpoints": per_endpoint,
+        "db_pool": {
+            "wait_ms": histograms.get("db_pool.wait_ms", {"count": 0}),
+            "timeouts": server_metrics.get("counters", {}).get("db_pool.timeouts", 0),
+        },
+        "server_metrics": server_metrics,
+    }
+
+
+# --- 3. Server Lifecycle ---
+def start_server(base_url, startup_timeout=30):
+    print("Starting server.py...")
+    process = subprocess.Popen([sys.executable, "server.py"], cwd=ROOT)
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("server.py exited during startup")
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"server.py did not become ready within {startup_timeout}s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- 4. Reporting ---
+def print_report(results):
+    overall = results["overall"]
+    print(f"\n{'endpoint':<14}{'reqs':>8}{'rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = list(results["endpoints"].items()) + [("ALL", overall)]
+    for name, data in rows:
+        latency = data["latency_ms"]
+        print(f"{name:<14}{data['requests']:>8}{data['throughput_rps']:>9.1f}{data['error_rate'] * 100:>6.2f}%"
+              f"{latency.get('p50', 0):>9.1f}{latency.get('p95', 0):>9.1f}{latency.get('p99', 0):>9.1f}")
+
+    pool = results["db_pool"]
+    print(f"\nDB pool wait (ms): p50={pool['wait_ms'].get('p50')} p95={pool['wait_ms'].get('p95')} "
+          f"p99={pool['wait_ms'].get('p99')}  timeouts={pool['timeouts']}  dropped arrivals={overall['dropped_arrivals']}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'metric':<28}{before.get('git_commit') or 'before':>12}{after.get('git_commit') or 'after':>12}{'change':>10}")
+    for name in sorted(set(before["results"]["endpoints"]) | {"overall"}):
+        b = before["results"]["overall"] if name == "overall" else before["results"]["endpoints"].get(name)
+        a = after["results"]["overall"] if name == "overall" else after["results"]["endpoints"].get(name)
+        if not a or not b:
+            continue
+        for label, get in (("rps", lambda d: d["throughput_rps"]),
+                           ("p95 ms", lambda d: d["latency_ms"].get("p95")),
+                           ("p99 ms", lambda d: d["latency_ms"].get("p99"))):
+            old, new = get(b), get(a)
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+            print(f"{name + ' ' + label:<28}{old!s:>12}{new!s:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--start-server", action="store_true", help="Launch server.py for the duration of the run")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load for")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0, help="Arrivals per second (0 = closed loop)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted request mix, e.g. verify=60,options=40")
+    parser.add_argument("--timeout", type=float, default=10, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Where to save the JSON results (default: results/loadtest_<commit>_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    server = start_server(args.base_url) if args.start_server else None
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(results)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        "results", f"loadtest_{commit or 'nogit'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "git_commit": commit,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "config": {k: v for k, v in vars(args).items() if k != "compare"},
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
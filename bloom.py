@@ -0,0 +1,59 @@
+import math
+import hashlib
+import threading
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter for strings.
+
+    `in` answers "definitely not present" or "maybe present"; there are no
+    false negatives for keys that were added. Sized for `capacity` keys at
+    `error_rate` false positives; adding more keys than that raises the
+    false-positive rate (see estimated_false_positive_rate()).
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher: k positions from two independent 64-bit hashes.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        # Setting a bit is a read-modify-write of a whole byte; serialize
+        # writers so concurrent adds can't drop each other's bits.
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def estimated_false_positive_rate(self):
+        """Expected false-positive rate for the number of keys added so far."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def fill_ratio(self):
+        """Fraction of bits set."""
+        return int.from_bytes(self.bits, "little").bit_count() / self.num_bits
@@ -0,0 +1,29 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+from urllib.parse import quote_plus
+
+# --- 1. Load Environment Variables ---
+# Shared by the migration module and the offline jobs so they all
+# read the same credentials as server.py.
+load_dotenv("api_secret.env")
+
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_PORT = os.environ.get("DB_PORT", "5432")
+DB_USER = os.environ.get("DB_USER", "postgres")
+DB_PASSWORD = os.environ.get("DB_PASSWORD")
+DB_NAME = os.environ.get("DB_NAME", "postgres")
+
+
+def get_database_url():
+    """Builds the Postgres DSN from the environment."""
+    if not DB_PASSWORD:
+        raise ValueError("DB_PASSWORD environment variable is not set!")
+
+    encoded_password = quote_plus(DB_PASSWORD)
+    return f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+def get_connection():
+    """Opens a new psycopg2 connection. The caller is responsible for closing it."""
+    return psycopg2.connect(get_database_url())
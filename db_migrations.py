@@ -0,0 +1,418 @@
+"""
+Versioned, idempotent schema migrations for the Postgres database.
+
+This module owns the schema. Each migration runs once, inside its own
+transaction, and is recorded in 'schema_migrations'. Run it from the CLI:
+
+    python db_migrations.py
+
+or call run_migrations(conn) with an open connection (server.py does this
+once at startup). The CLI also creates the upcoming monthly applications2
+partitions, so it is safe to run from cron.
+"""
+import sys
+import psycopg2
+
+# Arbitrary key for pg_advisory_xact_lock so two processes starting at the
+# same time don't try to apply the same migration twice.
+MIGRATION_LOCK_KEY = 726001
+
+# --- 1. The Migrations ---
+# (version, name, sql). Never edit a migration that has shipped; add a new one.
+MIGRATIONS = [
+    (1, "base_tables", """
+    CREATE TABLE IF NOT EXISTS customers (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL UNIQUE,
+        address TEXT NOT NULL,
+        pre_approved_limit INTEGER NOT NULL,
+        credit_score INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS loan_options (
+        id SERIAL PRIMARY KEY,
+        plan_name TEXT NOT NULL,
+        min_score INTEGER NOT NULL,
+        max_score INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        interest_rate INTEGER NOT NULL,
+        tenure_years INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS applications2 (
+        application_id TEXT PRIMARY KEY,
+        customer_id INTEGER REFERENCES customers(id),
+        plan_name TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        interest_rate REAL NOT NULL,
+        tenure_years INTEGER NOT NULL,
+        application_date TIMESTAMPTZ DEFAULT NOW()
+    );
+    """),
+
+    # /crm/verify and /add_customer both use the PIN, but the original
+    # customers DDL never declared it.
+    (2, "customers_pin", """
+    ALTER TABLE customers ADD COLUMN IF NOT EXISTS pin TEXT;
+    """),
+
+    # Hot-path indexes:
+    #  - /crm/verify filters on (phone, pin)
+    #  - per-customer application lookups filter on customer_id, newest first
+    #  - /loans/options asks "which bands contain this score", which a GiST
+    #    index over the closed score range answers without a full scan
+    (3, "hot_path_indexes", """
+    CREATE INDEX IF NOT EXISTS customers_phone_pin_idx
+        ON customers (phone, pin);
+
+    CREATE INDEX IF NOT EXISTS applications2_customer_date_idx
+        ON applications2 (customer_id, application_date);
+
+    CREATE INDEX IF NOT EXISTS loan_options_score_band_idx
+        ON loan_options USING gist (int4range(min_score, max_score, '[]'));
+    """),
+
+    # Monthly range partitioning of applications2 on application_date.
+    # Existing rows are copied into the new partitioned table in the same
+    # transaction, so this is also the migration path for live data.
+    # The primary key has to include the partition key.
+    (4, "partition_applications2", """
+    CREATE OR REPLACE FUNCTION ensure_applications2_partitions(start_month DATE, end_month DATE)
+    RETURNS INTEGER
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start DATE := date_trunc('month', start_month)::date;
+        partition_name TEXT;
+        created INTEGER := 0;
+    BEGIN
+        WHILE month_start <= end_month LOOP
+            partition_name := format('applications2_y%sm%s',
+                                     to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF applications2 FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, (month_start + INTERVAL '1 month')::date
+                );
+                created := created + 1;
+            END IF;
+            month_start := (month_start + INTERVAL '1 month')::date;
+        END LOOP;
+        RETURN created;
+    END;
+    $$;
+
+    ALTER TABLE applications2 RENAME TO applications2_legacy;
+    ALTER TABLE applications2_legacy RENAME CONSTRAINT applications2_pkey TO applications2_legacy_pkey;
+    ALTER INDEX applications2_customer_date_idx RENAME TO applications2_legacy_customer_date_idx;
+
+    CREATE TABLE applications2 (
+        application_id TEXT NOT NULL,
+        customer_id INTEGER REFERENCES customers(id),
+        plan_name TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        interest_rate REAL NOT NULL,
+        tenure_years INTEGER NOT NULL,
+        application_date TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (application_id, application_date)
+    ) PARTITION BY RANGE (application_date);
+
+    CREATE INDEX applications2_customer_date_idx
+        ON applications2 (customer_id, application_date);
+
+    -- Safety net for rows outside every monthly partition. It should stay
+    -- empty: a month can't be attached while the default holds its rows.
+    CREATE TABLE applications2_default PARTITION OF applications2 DEFAULT;
+
+    SELECT ensure_applications2_partitions(
+        COALESCE((SELECT MIN(application_date) FROM applications2_legacy)::date, CURRENT_DATE),
+        (CURRENT_DATE + INTERVAL '3 months')::date
+    );
+
+    INSERT INTO applications2
+        (application_id, customer_id, plan_name, amount, interest_rate, tenure_years, application_date)
+    SELECT application_id, customer_id, plan_name, amount, interest_rate, tenure_years,
+           COALESCE(application_date, NOW())
+    FROM applications2_legacy;
+
+    DROP TABLE applications2_legacy;
+    """),
+
+    # application_id becomes a native 16-byte uuid instead of 36-byte text.
+    # New IDs are time-ordered UUIDv7s (id_generator.py); the existing
+    # uuid4 strings cast cleanly.
+    (5, "applications2_uuid_ids", """
+    ALTER TABLE applications2
+        ALTER COLUMN application_id TYPE uuid USING application_id::uuid;
+    """),
+
+    # Customer loan listings page newest-first on (application_date, application_id).
+    # Extending the per-customer index with the tie-breaker lets each page be a
+    # single index range scan; it supersedes applications2_customer_date_idx.
+    (6, "applications2_customer_keyset_idx", """
+    CREATE INDEX IF NOT EXISTS applications2_customer_keyset_idx
+        ON applications2 (customer_id, application_date DESC, application_id DESC);
+
+    DROP INDEX IF EXISTS applications2_customer_date_idx;
+    """),
+
+    # Precomputed customer x plan eligibility matrix.
+    # One row per (customer, plan whose score band contains the customer's
+    # score), classified with the same rule as income_check_node:
+    #   instant       amount <= pre_approved_limit
+    #   income_proof  amount <= 2 * pre_approved_limit
+    #   ineligible    anything larger
+    # Plans outside the score band have no row. Statement-level triggers with
+    # transition tables keep it current incrementally, set-at-a-time, so bulk
+    # COPYs and batched UPDATEs don't pay a per-row trigger call.
+    (7, "customer_plan_eligibility", """
+    CREATE INDEX IF NOT EXISTS customers_credit_score_idx ON customers (credit_score);
+
+    CREATE TABLE IF NOT EXISTS customer_plan_eligibility (
+        customer_id INTEGER NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+        plan_id INTEGER NOT NULL REFERENCES loan_options(id) ON DELETE CASCADE,
+        eligibility TEXT NOT NULL CHECK (eligibility IN ('instant', 'income_proof', 'ineligible')),
+        PRIMARY KEY (customer_id, plan_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS customer_plan_eligibility_plan_idx
+        ON customer_plan_eligibility (plan_id);
+
+    CREATE OR REPLACE FUNCTION plan_eligibility(plan_amount INTEGER, pre_approved_limit INTEGER)
+    RETURNS TEXT
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT CASE
+            WHEN plan_amount <= pre_approved_limit THEN 'instant'
+            WHEN plan_amount <= 2 * pre_approved_limit THEN 'income_proof'
+            ELSE 'ineligible'
+        END
+    $$;
+
+    CREATE OR REPLACE FUNCTION refresh_customer_eligibility()
+    RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            -- Only customers whose score or limit actually changed
+            DELETE FROM customer_plan_eligibility e
+            USING new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE e.customer_id = n.id
+              AND (n.credit_score, n.pre_approved_limit) IS DISTINCT FROM (o.credit_score, o.pre_approved_limit);
+
+            INSERT INTO customer_plan_eligibility (customer_id, plan_id, eligibility)
+            SELECT n.id, lo.id, plan_eligibility(lo.amount, n.pre_approved_limit)
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN loan_options lo ON int4range(lo.min_score, lo.max_score, '[]') @> n.credit_score
+            WHERE (n.credit_score, n.pre_approved_limit) IS DISTINCT FROM (o.credit_score, o.pre_approved_limit);
+        ELSE
+            INSERT INTO customer_plan_eligibility (customer_id, plan_id, eligibility)
+            SELECT n.id, lo.id, plan_eligibility(lo.amount, n.pre_approved_limit)
+            FROM new_rows n
+            JOIN loan_options lo ON int4range(lo.min_score, lo.max_score, '[]') @> n.credit_score;
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE OR REPLACE FUNCTION refresh_plan_eligibility()
+    RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            DELETE FROM customer_plan_eligibility e
+            USING new_rows n
+            WHERE e.plan_id = n.id;
+        END IF;
+
+        INSERT INTO customer_plan_eligibility (customer_id, plan_id, eligibility)
+        SELECT c.id, n.id, plan_eligibility(n.amount, c.pre_approved_limit)
+        FROM new_rows n
+        JOIN customers c ON c.credit_score BETWEEN n.min_score AND n.max_score;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE TRIGGER customers_eligibility_insert
+        AFTER INSERT ON customers
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_customer_eligibility();
+
+    CREATE TRIGGER customers_eligibility_update
+        AFTER UPDATE ON customers
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_customer_eligibility();
+
+    CREATE TRIGGER loan_options_eligibility_insert
+        AFTER INSERT ON loan_options
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_plan_eligibility();
+
+    CREATE TRIGGER loan_options_eligibility_update
+        AFTER UPDATE ON loan_options
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_plan_eligibility();
+
+    -- Backfill for the customers and plans that already exist
+    INSERT INTO customer_plan_eligibility (customer_id, plan_id, eligibility)
+    SELECT c.id, lo.id, plan_eligibility(lo.amount, c.pre_approved_limit)
+    FROM customers c
+    JOIN loan_options lo ON int4range(lo.min_score, lo.max_score, '[]') @> c.credit_score
+    ON CONFLICT DO NOTHING;
+    """),
+
+    # Output of batch_underwriting.py: for every customer, each plan they
+    # qualify for and its EMI, tagged with the run that produced it.
+    (8, "underwriting_results", """
+    CREATE TABLE IF NOT EXISTS underwriting_runs (
+        run_id UUID PRIMARY KEY,
+        started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        finished_at TIMESTAMPTZ,
+        customers INTEGER,
+        result_rows BIGINT
+    );
+
+    CREATE TABLE IF NOT EXISTS underwriting_results (
+        run_id UUID NOT NULL REFERENCES underwriting_runs(run_id) ON DELETE CASCADE,
+        customer_id INTEGER NOT NULL,
+        plan_id INTEGER NOT NULL,
+        eligibility TEXT NOT NULL,
+        monthly_emi NUMERIC(12, 2) NOT NULL,
+        total_payable NUMERIC(14, 2) NOT NULL,
+        PRIMARY KEY (run_id, customer_id, plan_id)
+    );
+    """),
+
+    # A single counter bumped by every write to loan_options, so servers can
+    # cache anything derived from the plan catalog (e.g. /loans/quote EMIs)
+    # and tell cheaply when it has gone stale.
+    (9, "loan_catalog_version", """
+    CREATE TABLE IF NOT EXISTS loan_catalog_version (
+        singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+        version BIGINT NOT NULL DEFAULT 1
+    );
+
+    INSERT INTO loan_catalog_version (singleton) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+    CREATE OR REPLACE FUNCTION bump_loan_catalog_version()
+    RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE loan_catalog_version SET version = version + 1;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE TRIGGER loan_options_catalog_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON loan_options
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_loan_catalog_version();
+    """),
+]
+
+# How many months of applications2 partitions to keep created ahead of today.
+PARTITION_MONTHS_AHEAD = 3
+
+
+# --- 2. The Runner ---
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    """)
+
+
+def get_applied_versions(conn):
+    """Returns the set of migration versions already recorded in the database."""
+    with conn.cursor() as cursor:
+        _ensure_migrations_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def run_migrations(conn):
+    """
+    Applies every pending migration using the given connection.
+    Safe to call repeatedly; returns the list of versions applied by this call.
+    """
+    applied_now = []
+
+    for version, name, sql in MIGRATIONS:
+        try:
+            with conn.cursor() as cursor:
+                _ensure_migrations_table(cursor)
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+
+                # Re-check under the lock: another process may have won the race.
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cursor.fetchone():
+                    conn.commit()
+                    continue
+
+                print(f"Applying migration {version:03d}_{name}...")
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+            conn.commit()
+            applied_now.append(version)
+
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"Migration {version:03d}_{name} failed: {e}")
+            raise
+
+    if applied_now:
+        print(f"Applied {len(applied_now)} migration(s): {applied_now}")
+    else:
+        print("Database schema is up to date.")
+    return applied_now
+
+
+def ensure_future_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Creates any missing monthly applications2 partitions from the current
+    month up to `months_ahead` months from now. Returns how many were created.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT ensure_applications2_partitions(CURRENT_DATE, "
+                "(CURRENT_DATE + make_interval(months => %s))::date)",
+                (months_ahead,)
+            )
+            created = cursor.fetchone()[0]
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Could not create applications2 partitions: {e}")
+        raise
+
+    if created:
+        print(f"Created {created} new applications2 partition(s).")
+    return created
+
+
+# --- 3. CLI ---
+if __name__ == "__main__":
+    from db_config import get_connection
+
+    conn = None
+    try:
+        conn = get_connection()
+        if "--status" in sys.argv:
+            applied = get_applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                marker = "x" if version in applied else " "
+                print(f"[{marker}] {version:03d}_{name}")
+        else:
+            run_migrations(conn)
+            ensure_future_partitions(conn)
+    finally:
+        if conn:
+            conn.close()
@@ -0,0 +1,333 @@
+import os
+import time
+import random
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+import weakref
+import httpx
+import requests
+from urllib.parse import urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+import metrics
+
+# --- Shared HTTP client for the agent tools ---
+# One keep-alive session for every call to server.py, with per-endpoint
+# timeouts, jittered retries for idempotent (GET) calls, a circuit breaker
+# that fails fast while the server is down, and per-endpoint latency metrics.
+# request()/get()/post() are blocking (requests); arequest()/aget()/apost()
+# are the asyncio equivalents (httpx) and raise the same requests exceptions.
+load_dotenv("api_secret.env")
+
+# "http" (default) talks to server.py over the network. "inprocess" calls the
+# FastAPI app in this process instead (single-node deployments); so does any
+# URL with the inprocess:// scheme, e.g. API_BASE_URL=inprocess://server.
+AGENT_TRANSPORT = os.environ.get("AGENT_TRANSPORT", "http").lower()
+INPROCESS_SCHEME = "inprocess"
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "2"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+
+# (connect, read) seconds per endpoint name; anything else gets the defaults.
+# Lookups are fast; writes and full history reads get more room.
+ENDPOINT_TIMEOUTS = {
+    "customer_360": (HTTP_CONNECT_TIMEOUT, 5.0),
+    "loan_quote": (HTTP_CONNECT_TIMEOUT, 5.0),
+    "fetch_application": (HTTP_CONNECT_TIMEOUT, 5.0),
+    "customer_applications": (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    "log_application": (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    "add_customer": (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+}
+
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = 0.2
+RETRY_STATUS_CODES = {502, 503, 504}
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("HTTP_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("HTTP_CIRCUIT_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without making a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures (connection errors,
+    timeouts, 5xx) and rejects calls for `reset_seconds`. After that a single
+    trial call is let through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"HTTP circuit breaker opened after {self._failures} consecutive failures")
+                    metrics.increment("http_client.circuit_opened")
+                self._opened_at = time.monotonic()
+
+
+def _build_session():
+    session = requests.Session()
+    # Retries are handled below (GET only, with jitter), not by urllib3.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _build_session()
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+
+
+# --- In-process transport ---
+# Requests are dispatched straight into server.app through httpx's
+# ASGITransport: same routing, validation and responses as over HTTP, minus
+# the socket, HTTP parsing and connection handling. server.py is only
+# imported the first time an in-process call is made; its lifespan (DB pool,
+# migrations, timers) is then entered once, for the life of the process, on a
+# dedicated event loop thread. Blocking callers send their requests through
+# that loop; async callers use an ASGITransport client on their own loop.
+# Per-endpoint read timeouts apply to both, as an overall deadline.
+_inprocess_loop = None
+_inprocess_lock = threading.Lock()
+
+
+def is_inprocess(url):
+    return AGENT_TRANSPORT == "inprocess" or urlsplit(url).scheme == INPROCESS_SCHEME
+
+
+def _get_inprocess_loop():
+    """The in-process server's event loop, started (with the app's lifespan) on first use."""
+    global _inprocess_loop
+    with _inprocess_lock:
+        if _inprocess_loop is None:
+            import server
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="inprocess-server", daemon=True)
+            thread.start()
+            lifespan = server.app.router.lifespan_context(server.app)
+            try:
+                asyncio.run_coroutine_threadsafe(lifespan.__aenter__(), loop).result()
+            except Exception as e:
+                # e.g. no database: fail like an unreachable server (so the circuit
+                # breaker counts it), and try again on the next call
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise requests.ConnectionError(f"In-process server failed to start: {e}") from e
+
+            def shut_down():
+                asyncio.run_coroutine_threadsafe(lifespan.__aexit__(None, None, None), loop).result(timeout=10)
+
+            atexit.register(shut_down)
+            _inprocess_loop = loop
+            print("HTTP client: using the in-process transport to server.app")
+        return _inprocess_loop
+
+
+def _path_and_query(url):
+    # In-process clients supply their own host; only the path and query matter.
+    parts = urlsplit(url)
+    return urlunsplit(("", "", parts.path, parts.query, ""))
+
+
+async def _inprocess_send(method, url, **kwargs):
+    return await _get_async_client(True).request(method, _path_and_query(url), **kwargs)
+
+
+def _inprocess_request(endpoint, method, url, **kwargs):
+    future = asyncio.run_coroutine_threadsafe(_inprocess_send(method, url, **kwargs), _get_inprocess_loop())
+    try:
+        return future.result(timeout=_timeout(endpoint)[1])
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise requests.Timeout(f"In-process {endpoint} call took longer than {_timeout(endpoint)[1]}s")
+    except httpx.TransportError as e:
+        raise requests.ConnectionError(str(e)) from e
+
+
+def _timeout(endpoint):
+    return ENDPOINT_TIMEOUTS.get(endpoint, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+
+def _record_response(endpoint, response):
+    metrics.increment(f"http_client.{endpoint}.status_{response.status_code}")
+    if response.status_code >= 500:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success()
+
+
+def _check_circuit(endpoint):
+    if not circuit_breaker.allow():
+        metrics.increment(f"http_client.{endpoint}.rejected")
+        raise CircuitOpenError(f"Circuit open: not calling {endpoint} while the API server is failing")
+
+
+def _send(endpoint, method, url, **kwargs):
+    """One attempt, guarded by the circuit breaker and timed."""
+    _check_circuit(endpoint)
+
+    started = time.perf_counter()
+    try:
+        if is_inprocess(url):
+            response = _inprocess_request(endpoint, method, url, **kwargs)
+        else:
+            response = session.request(method, url, timeout=_timeout(endpoint), **kwargs)
+    except requests.RequestException:
+        metrics.increment(f"http_client.{endpoint}.errors")
+        circuit_breaker.record_failure()
+        raise
+    finally:
+        metrics.observe(f"http_client.{endpoint}.ms", (time.perf_counter() - started) * 1000)
+
+    _record_response(endpoint, response)
+    return response
+
+
+def request(endpoint, method, url, **kwargs):
+    """
+    Sends a request to server.py as `endpoint` (the name used for timeouts
+    and metrics). GETs are retried on connection errors, timeouts and
+    502/503/504 with full-jitter exponential backoff; other methods are sent
+    once. Raises requests.RequestException subclasses on failure, including
+    CircuitOpenError (a ConnectionError) while the circuit is open.
+    """
+    attempts = 1 + (HTTP_MAX_RETRIES if method.upper() == "GET" else 0)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = _send(endpoint, method, url, **kwargs)
+        except CircuitOpenError:
+            raise
+        except (requests.ConnectionError, requests.Timeout):
+            if last_attempt:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+
+        metrics.increment(f"http_client.{endpoint}.retries")
+        time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def get(endpoint, url, **kwargs):
+    return request(endpoint, "GET", url, **kwargs)
+
+
+def post(endpoint, url, **kwargs):
+    return request(endpoint, "POST", url, **kwargs)
+
+
+# --- Async client ---
+# An httpx.AsyncClient is bound to the event loop it was first used on, so
+# each running loop gets its own pair (network, in-process).
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client(inprocess):
+    """This loop's client; the in-process one needs _get_inprocess_loop() to have started the server."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if inprocess not in clients:
+        if inprocess:
+            import server
+
+            transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+            clients[inprocess] = httpx.AsyncClient(transport=transport, base_url="http://inprocess")
+        else:
+            limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+            clients[inprocess] = httpx.AsyncClient(limits=limits)
+    return clients[inprocess]
+
+
+async def _asend(endpoint, method, url, **kwargs):
+    """Async twin of _send(). httpx errors are re-raised as their requests equivalents."""
+    _check_circuit(endpoint)
+
+    started = time.perf_counter()
+    try:
+        if is_inprocess(url):
+            if _inprocess_loop is None:
+                await asyncio.to_thread(_get_inprocess_loop)
+            read_timeout = _timeout(endpoint)[1]
+            try:
+                response = await asyncio.wait_for(_inprocess_send(method, url, **kwargs), read_timeout)
+            except asyncio.TimeoutError as e:
+                raise httpx.ReadTimeout(f"In-process {endpoint} call took longer than {read_timeout}s") from e
+        else:
+            connect_timeout, read_timeout = _timeout(endpoint)
+            response = await _get_async_client(False).request(
+                method, url, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **kwargs
+            )
+    except (httpx.TransportError, requests.ConnectionError) as e:
+        # requests.ConnectionError: the in-process server failed to start
+        metrics.increment(f"http_client.{endpoint}.errors")
+        circuit_breaker.record_failure()
+        if isinstance(e, requests.ConnectionError):
+            raise
+        if isinstance(e, httpx.TimeoutException):
+            raise requests.Timeout(str(e)) from e
+        raise requests.ConnectionError(str(e)) from e
+    finally:
+        metrics.observe(f"http_client.{endpoint}.ms", (time.perf_counter() - started) * 1000)
+
+    _record_response(endpoint, response)
+    return response
+
+
+async def arequest(endpoint, method, url, **kwargs):
+    """Async twin of request(), with the same retry, timeout and circuit-breaker behaviour."""
+    attempts = 1 + (HTTP_MAX_RETRIES if method.upper() == "GET" else 0)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = await _asend(endpoint, method, url, **kwargs)
+        except CircuitOpenError:
+            raise
+        except (requests.ConnectionError, requests.Timeout):
+            if last_attempt:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+
+        metrics.increment(f"http_client.{endpoint}.retries")
+        await asyncio.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+async def aget(endpoint, url, **kwargs):
+    return await arequest(endpoint, "GET", url, **kwargs)
+
+
+async def apost(endpoint, url, **kwargs):
+    return await arequest(endpoint, "POST", url, **kwargs)
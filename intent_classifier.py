@@ -0,0 +1,261 @@
+"""
+Local loan-intent classifier for SalesAgent (CHECK 8).
+
+Decides whether an unverified user's message means "I want to apply for a
+loan" without an LLM round trip, in tiers:
+
+1. grammar: a few anchored patterns for the clear-cut cases ("I want a
+            loan", "apply for a personal loan"). Anything with a negator,
+            or about an existing loan (repay, prepay, close, status), is
+            left to the next tiers.
+2. model:   a small naive Bayes text model (intent_model.json, trained from
+            intent_examples.jsonl and shipped with the repo)
+3. llm:     anything still below INTENT_CONFIDENCE_THRESHOLD is left to the
+            caller's LLM prompt (classify() returns wants_loan=None)
+
+The grammar tier's confidence is its precision measured on the held-out,
+labelled intent_eval.jsonl (stored in intent_model.json at training time),
+and the tier is skipped while that precision is below the threshold.
+Each tier's hits are counted in metrics as intent.tier.<name>.
+
+Retrain after editing the examples (also re-measures the grammar tier):
+    python intent_classifier.py --train
+Report each tier's precision and coverage on intent_eval.jsonl:
+    python intent_classifier.py --evaluate
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import NamedTuple, Optional
+import metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_PATH = os.path.join(BASE_DIR, "intent_examples.jsonl")
+EVAL_PATH = os.path.join(BASE_DIR, "intent_eval.jsonl")
+MODEL_PATH = os.path.join(BASE_DIR, "intent_model.json")
+
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+
+
+class IntentResult(NamedTuple):
+    wants_loan: Optional[bool]  # None: not confident enough, ask the LLM
+    confidence: float
+    tier: str
+
+
+# --- 1. Grammar ---
+_LOAN_WORDS = r"(?:loan|loans|credit|finance|money|cash)"
+_DETERMINER = r"(?:a|an|the|some)\s+(?:(?:personal|small|new|quick)\s+)?"
+
+# Any of these sends the message past the grammar tier: negated or hedged
+# requests ("I never said I want a loan", "not sure if I need a loan") are
+# for the model or the LLM to judge.
+NEGATION = re.compile(
+    r"\b(?:not|no|never|nope|nah|neither|nor|without|cannot|can'?t|don'?t|dont|doesn'?t|didn'?t|"
+    r"won'?t|wouldn'?t|shouldn'?t|isn'?t|aren'?t|wasn'?t|unsure|maybe|perhaps|if|whether)\b"
+)
+
+# About a loan the customer already has, not a new application
+EXISTING_LOAN = re.compile(
+    r"\b(?:repay\w*|prepay\w*|pre-pay\w*|foreclos\w*|clos(?:e|ed|ing|ure)|status|track\w*|"
+    r"outstanding|pay\s+off|paid|settle\w*|existing|current|my\s+(?:loan|credit|emi)s?)\b"
+)
+
+NEGATIVE_PATTERNS = [re.compile(p) for p in [
+    r"\b(?:just|only)\s+(?:asking|curious|browsing|checking|wondering)\b",
+]]
+
+POSITIVE_PATTERNS = [re.compile(p) for p in [
+    rf"\b(?:i|we)(?:'d|\s+would)?\s+(?:really\s+)?(?:want|need|like)\s+{_DETERMINER}{_LOAN_WORDS}\b",
+    rf"\b(?:i|we)(?:'m|\s+am|'re|\s+are)\s+(?:looking\s+for|interested\s+in)\s+{_DETERMINER}{_LOAN_WORDS}\b",
+    rf"\b(?:can|could|may)\s+(?:i|we)\s+(?:get|have|take)\s+{_DETERMINER}{_LOAN_WORDS}\b",
+    r"\b(?:apply|applying)\s+for\s+(?:a\s+|the\s+)?(?:personal\s+)?(?:loan|credit)\b",
+    r"\b(?:give|get)\s+me\s+(?:a\s+)?loan\b",
+]]
+
+# General questions ("what is a credit score") aren't a request to apply,
+# unless they're about the user themselves ("what loans can I get").
+GENERAL_QUESTION = re.compile(r"^\s*(?:what|how|why|who|when|which|explain|tell me)\b")
+SELF_REFERENCE = re.compile(r"\b(?:i|me|my|i'm|i'd)\b")
+
+
+def classify_grammar(text):
+    """YES/NO for unambiguous phrasings, None when the patterns disagree or don't apply."""
+    if NEGATION.search(text) or EXISTING_LOAN.search(text):
+        return None
+
+    negative = any(p.search(text) for p in NEGATIVE_PATTERNS)
+    positive = any(p.search(text) for p in POSITIVE_PATTERNS)
+
+    if negative and not positive:
+        return False
+    if positive and not negative:
+        return True
+    if not negative and not positive and GENERAL_QUESTION.search(text) and not SELF_REFERENCE.search(text):
+        return False
+    return None
+
+
+def grammar_precision(examples):
+    """(precision, coverage) of classify_grammar on labelled examples."""
+    answered = correct = 0
+    for example in examples:
+        answer = classify_grammar(example["text"].lower())
+        if answer is not None:
+            answered += 1
+            correct += answer == (example["label"] == "YES")
+    return (correct / answered if answered else 0.0), answered / len(examples)
+
+
+# --- 2. Naive Bayes model ---
+_TOKEN = re.compile(r"[a-z0-9']+|[.,!?;]")
+_NEGATORS = {"not", "no", "never", "don't", "dont", "doesn't", "won't", "nah", "without"}
+_SCOPE_END = {".", ",", "!", "?", ";", "but"}
+
+
+def tokenize(text):
+    """
+    Lowercased unigrams and bigrams. Words after a negator (up to the next
+    punctuation or 'but') are marked NOT_, so "don't want a loan" and
+    "want a loan" produce different features.
+    """
+    words = []
+    negated = False
+    for token in _TOKEN.findall(text.lower()):
+        if token in _SCOPE_END:
+            negated = False
+            continue
+        if token in _NEGATORS:
+            negated = True
+            words.append(token)
+            continue
+        words.append(f"NOT_{token}" if negated else token)
+
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def train(examples):
+    """Fits a multinomial naive Bayes model with add-one smoothing; returns it as a dict."""
+    counts = {}
+    docs = Counter()
+    for example in examples:
+        docs[example["label"]] += 1
+        counts.setdefault(example["label"], Counter()).update(tokenize(example["text"]))
+
+    vocabulary = set().union(*counts.values())
+    model = {"classes": sorted(counts), "log_priors": {}, "log_likelihoods": {}, "unknown_log_likelihood": {}}
+    for label, token_counts in counts.items():
+        denominator = sum(token_counts.values()) + len(vocabulary)
+        model["log_priors"][label] = math.log(docs[label] / sum(docs.values()))
+        model["log_likelihoods"][label] = {
+            token: round(math.log((token_counts[token] + 1) / denominator), 6) for token in sorted(vocabulary)
+        }
+        model["unknown_log_likelihood"][label] = math.log(1 / denominator)
+    return model
+
+
+def predict(model, text):
+    """(label, posterior probability) of the most likely class."""
+    tokens = tokenize(text)
+    scores = {}
+    for label in model["classes"]:
+        likelihoods = model["log_likelihoods"][label]
+        unknown = model["unknown_log_likelihood"][label]
+        scores[label] = model["log_priors"][label] + sum(likelihoods.get(token, unknown) for token in tokens)
+
+    best = max(scores, key=scores.get)
+    total = sum(math.exp(score - scores[best]) for score in scores.values())
+    return best, 1 / total
+
+
+_model = None
+
+
+def get_model():
+    """The trained model from MODEL_PATH, loaded on first use."""
+    global _model
+    if _model is None:
+        with open(MODEL_PATH, encoding="utf-8") as f:
+            _model = json.load(f)
+    return _model
+
+
+# --- 3. Tiered classification ---
+def classify(message):
+    """
+    Classifies a message as wanting a loan or not. Returns wants_loan=None
+    (tier 'llm') when neither local tier reaches the confidence threshold.
+    """
+    text = message.lower()
+    model = get_model()
+
+    # Only trusted while its precision measured on intent_eval.jsonl clears the threshold
+    grammar_confidence = model.get("grammar_precision", 0.0)
+    grammar = classify_grammar(text) if grammar_confidence >= INTENT_CONFIDENCE_THRESHOLD else None
+    if grammar is not None:
+        metrics.increment("intent.tier.grammar")
+        return IntentResult(grammar, grammar_confidence, "grammar")
+
+    label, confidence = predict(model, text)
+    if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+        metrics.increment("intent.tier.model")
+        return IntentResult(label == "YES", confidence, "model")
+
+    metrics.increment("intent.tier.llm")
+    return IntentResult(None, confidence, "llm")
+
+
+def load_examples(path=EXAMPLES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(examples):
+    """Prints the grammar and model tiers' precision and coverage on labelled examples."""
+    precision, coverage = grammar_precision(examples)
+    print(f"grammar: precision {precision:.1%} on the {coverage:.0%} of {len(examples)} examples it answers")
+    for example in examples:
+        answer = classify_grammar(example["text"].lower())
+        if answer is not None and answer != (example["label"] == "YES"):
+            print(f"  wrong: {example['text']!r} -> {'YES' if answer else 'NO'}")
+
+    model = get_model()
+    answered = correct = 0
+    for example in examples:
+        label, confidence = predict(model, example["text"].lower())
+        if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            answered += 1
+            correct += label == example["label"]
+    print(f"model:   precision {correct / answered if answered else 0:.1%} on the "
+          f"{answered / len(examples):.0%} it answers at >= {INTENT_CONFIDENCE_THRESHOLD}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help=f"Retrain {os.path.basename(MODEL_PATH)} from the examples")
+    parser.add_argument("--evaluate", action="store_true", help=f"Report each tier's precision on {os.path.basename(EVAL_PATH)}")
+    parser.add_argument("message", nargs="*", help="Classify a message")
+    args = parser.parse_args()
+
+    if args.train:
+        examples = load_examples()
+        model = train(examples)
+        model["grammar_precision"], _ = grammar_precision(load_examples(EVAL_PATH))
+        with open(MODEL_PATH, "w", encoding="utf-8") as f:
+            json.dump(model, f, indent=1, sort_keys=True)
+        correct = sum(predict(model, e["text"].lower())[0] == e["label"] for e in examples)
+        print(f"Trained on {len(examples)} examples ({len(model['log_likelihoods'][model['classes'][0]])} features), "
+              f"training accuracy {correct / len(examples):.1%}. Saved to {MODEL_PATH}")
+
+    if args.evaluate:
+        evaluate(load_examples(EVAL_PATH))
+
+    if args.message:
+        print(classify(" ".join(args.message)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from langchain_core.runnables import RunnableLambda
+import metrics
+
+# --- LLM gateway ---
+# Every Gemini call from the agent goes through here (see guarded()):
+# - one concurrency cap for the whole process, shared by blocking callers and
+#   every event loop
+# - a token bucket, so bursts of conversations don't trip the quota. A call
+#   waits out its rate token before taking a slot, so throttled calls don't
+#   hold slots other calls could use
+# - 429 / quota errors retried with full-jitter exponential backoff
+# - a deadline for the whole call, retries included
+# - hedging: once a call has run past its callsite's p95 latency, a duplicate
+#   is sent if there's spare capacity and whichever finishes first wins
+# Metrics go under llm.<callsite>.*, where the callsite is
+# "<graph node>.<runnable name>", e.g. llm.SalesAgent.chat_llm.ms.
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_SECOND = float(os.environ.get("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "10"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get("LLM_RETRY_BACKOFF_SECONDS", "1"))
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", "30"))
+LLM_HEDGING = os.environ.get("LLM_HEDGING", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+RATE_LIMIT_MARKERS = ("429", "ResourceExhausted", "RESOURCE_EXHAUSTED", "RateLimit", "quota")
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when an LLM call (with its retries and hedges) runs past its deadline."""
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, up to `capacity`. reserve() always takes a
+    token and returns how long to wait before using it (the bucket may go
+    into debt), so it serves both blocking and asyncio callers.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        """Gives back a token reserved for a call that was never sent."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def try_take(self):
+        """Takes a token only if one is available right now."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Waiter:
+    """A caller queued for a ConcurrencyLimiter slot: a thread (event) or a coroutine (future on its loop)."""
+
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        """Hands this waiter a slot; False if its event loop has gone away."""
+        if self.loop is None:
+            self.granted = True
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:  # loop closed
+            return False
+        self.granted = True
+        return True
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` calls in flight across all threads and event loops.
+    Blocking callers wait on an event, asyncio callers on a future of their
+    own loop; release() hands the freed slot straight to the longest waiter
+    of either kind.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_use = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _take_or_queue(self, loop=None):
+        """Takes a free slot (returns None) or queues and returns a waiter."""
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return None
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter):
+        """Dequeues a waiter that stopped waiting; True if it was granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def try_acquire(self):
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return True
+            return False
+
+    def acquire(self, timeout):
+        waiter = self._take_or_queue()
+        if waiter is None or waiter.event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def aacquire(self, timeout):
+        waiter = self._take_or_queue(asyncio.get_running_loop())
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft().wake():
+                    return
+            self._in_use -= 1
+
+
+bucket = TokenBucket(LLM_RATE_PER_SECOND, LLM_BURST)
+slots = ConcurrencyLimiter(LLM_MAX_CONCURRENCY)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Calls run on worker threads so the caller can stop waiting at the
+    # deadline or when a hedge wins; abandoned calls finish in the background
+    # and keep their concurrency slot until they do.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Every running blocking call holds a slot, so this many workers is enough
+            _executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        return _executor
+
+
+def is_rate_limited(error):
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+def hedge_delay(callsite):
+    """Seconds after which to hedge a call from `callsite`, or None until it has enough history."""
+    name = f"llm.{callsite}.ms"
+    if not LLM_HEDGING or metrics.get_sample_count(name) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return metrics.get_percentile(name, LLM_HEDGE_PERCENTILE) / 1000
+
+
+def _remaining(deadline):
+    return deadline - time.monotonic()
+
+
+def _backoff(attempt):
+    return random.uniform(0, LLM_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+
+# --- Blocking calls ---
+def _timed_call(runnable, input, config, callsite):
+    started = time.perf_counter()
+    try:
+        result = runnable.invoke(input, config)
+    finally:
+        slots.release()
+    metrics.observe(f"llm.{callsite}.ms", (time.perf_counter() - started) * 1000)
+    return result
+
+
+def _reserve_token(callsite, deadline):
+    """Takes a rate token and returns the wait before it can be used, or raises if that's past the deadline."""
+    delay = bucket.reserve()
+    if delay:
+        metrics.increment(f"llm.{callsite}.throttled")
+        if delay >= _remaining(deadline):
+            bucket.refund()
+            raise LLMDeadlineExceeded(f"Rate limit would delay {callsite} past the deadline")
+    return delay
+
+
+def _start(runnable, input, config, callsite, deadline):
+    """Waits for a rate token, then for a concurrency slot, then starts the call."""
+    time.sleep(_reserve_token(callsite, deadline))
+    if not slots.acquire(timeout=max(_remaining(deadline), 0)):
+        bucket.refund()
+        raise LLMDeadlineExceeded(f"No free LLM slot for {callsite} before the deadline")
+    return _get_executor().submit(_timed_call, runnable, input, config, callsite)
+
+
+def _start_hedge(runnable, input, config, callsite):
+    """Starts a duplicate call only if a rate token and a slot are free right now."""
+    if not bucket.try_take():
+        return None
+    if not slots.try_acquire():
+        bucket.refund()
+        return None
+    metrics.increment(f"llm.{callsite}.hedged")
+    return _get_executor().submit(_timed_call, runnable, input, config, callsite)
+
+
+def _attempt(runnable, input, config, callsite, deadline, hedge):
+    primary = _start(runnable, input, config, callsite, deadline)
+    pending = {primary}
+    hedge_at = None
+    if hedge and (delay := hedge_delay(callsite)) is not None:
+        hedge_at = time.monotonic() + delay
+
+    error = None
+    while pending:
+        wake_at = deadline if hedge_at is None else min(hedge_at, deadline)
+        done, pending = wait(pending, timeout=max(wake_at - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is not primary:
+                    metrics.increment(f"llm.{callsite}.hedge_wins")
+                return future.result()
+            error = future.exception()
+
+        if hedge_at is not None and time.monotonic() >= hedge_at:
+            hedge_at = None
+            if pending:
+                hedged = _start_hedge(runnable, input, config, callsite)
+                if hedged is not None:
+                    pending.add(hedged)
+        elif not done and time.monotonic() >= deadline:
+            raise LLMDeadlineExceeded(f"LLM call from {callsite} ran past its deadline")
+    raise error
+
+
+def invoke(runnable, input, config=None, callsite="llm", hedge=True, deadline_seconds=LLM_DEADLINE_SECONDS):
+    """runnable.invoke(input, config) under the gateway's limits, retries, deadline and hedging."""
+    deadline = time.monotonic() + deadline_seconds
+    try:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                return _attempt(runnable, input, config, callsite, deadline, hedge)
+            except LLMDeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == LLM_MAX_RETRIES:
+                    raise
+                metrics.increment(f"llm.{callsite}.rate_limited")
+                delay = _backoff(attempt)
+                if delay >= _remaining(deadline):
+                    raise
+                time.sleep(delay)
+    except LLMDeadlineExceeded:
+        metrics.increment(f"llm.{callsite}.timeouts")
+        raise
+    except Exception:
+        metrics.increment(f"llm.{callsite}.errors")
+        raise
+
+
+# --- Async calls ---
+# Same limits as the blocking path: the shared token bucket and slots.
+async def _atimed_call(runnable, input, config, callsite):
+    started = time.perf_counter()
+    try:
+        result = await runnable.ainvoke(input, config)
+    finally:
+        slots.release()
+    metrics.observe(f"llm.{callsite}.ms", (time.perf_counter() - started) * 1000)
+    return result
+
+
+async def _astart(runnable, input, config, callsite, deadline):
+    await asyncio.sleep(_reserve_token(callsite, deadline))
+    if not await slots.aacquire(timeout=max(_remaining(deadline), 0)):
+        bucket.refund()
+        raise LLMDeadlineExceeded(f"No free LLM slot for {callsite} before the deadline")
+    return asyncio.ensure_future(_atimed_call(runnable, input, config, callsite))
+
+
+def _astart_hedge(runnable, input, config, callsite):
+    if not bucket.try_take():
+        return None
+    if not slots.try_acquire():
+        bucket.refund()
+        return None
+    metrics.increment(f"llm.{callsite}.hedged")
+    return asyncio.ensure_future(_atimed_call(runnable, input, config, callsite))
+
+
+async def _aattempt(runnable, input, config, callsite, deadline, hedge):
+    primary = await _astart(runnable, input, config, callsite, deadline)
+    pending = {primary}
+    hedge_at = None
+    if hedge and (delay := hedge_delay(callsite)) is not None:
+        hedge_at = time.monotonic() + delay
+
+    error = None
+    try:
+        while pending:
+            wake_at = deadline if hedge_at is None else min(hedge_at, deadline)
+            done, pending = await asyncio.wait(
+                pending, timeout=max(wake_at - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.increment(f"llm.{callsite}.hedge_wins")
+                    return task.result()
+                error = task.exception()
+
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                if pending:
+                    hedged = _astart_hedge(runnable, input, config, callsite)
+                    if hedged is not None:
+                        pending.add(hedged)
+            elif not done and time.monotonic() >= deadline:
+                raise LLMDeadlineExceeded(f"LLM call from {callsite} ran past its deadline")
+        raise error
+    finally:
+        # Unlike threads, the losing or timed-out calls can be cancelled
+        for task in pending:
+            task.cancel()
+
+
+async def ainvoke(runnable, input, config=None, callsite="llm", hedge=True, deadline_seconds=LLM_DEADLINE_SECONDS):
+    """Async twin of invoke()."""
+    deadline = time.monotonic() + deadline_seconds
+    try:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                return await _aattempt(runnable, input, config, callsite, deadline, hedge)
+            except LLMDeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == LLM_MAX_RETRIES:
+                    raise
+                metrics.increment(f"llm.{callsite}.rate_limited")
+                delay = _backoff(attempt)
+                if delay >= _remaining(deadline):
+                    raise
+                await asyncio.sleep(delay)
+    except LLMDeadlineExceeded:
+        metrics.increment(f"llm.{callsite}.timeouts")
+        raise
+    except Exception:
+        metrics.increment(f"llm.{callsite}.errors")
+        raise
+
+
+def _callsite(name, config):
+    node = (config or {}).get("metadata", {}).get("langgraph_node")
+    return f"{node}.{name}" if node else name
+
+
+def guarded(runnable, name, hedge=True):
+    """
+    Wraps an LLM runnable so invoke/ainvoke go through the gateway. `runnable`
+    may also be a zero-argument factory, called once on first use, so the
+    client isn't built until something needs it. Pass hedge=False for calls
+    whose tokens are streamed to the user, so a duplicate doesn't stream the
+    reply twice.
+    """
+    resolved = []
+
+    def target():
+        if not resolved:
+            resolved.append(runnable if hasattr(runnable, "invoke") else runnable())
+        return resolved[0]
+
+    def run(input, config):
+        return invoke(target(), input, config=config, callsite=_callsite(name, config), hedge=hedge)
+
+    async def arun(input, config):
+        return await ainvoke(target(), input, config=config, callsite=_callsite(name, config), hedge=hedge)
+
+    return RunnableLambda(run, afunc=arun, name=name)
@@ -1,6 +1,7 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from db_migrations import run_migrations
 
 # --- Add this function to setup_postgres_db.py ---
 
@@ -21,19 +22,7 @@ def create_applications_table():
         print("Error: DB_PASSWORD not found.")
         return
 
-    # 2. Define the table structure
-    # This table will store the final, approved loan details
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS applications2 (
-        application_id TEXT PRIMARY KEY,
-        customer_id INTEGER REFERENCES customers(id),
-        plan_name TEXT NOT NULL,
-        amount INTEGER NOT NULL,
-        interest_rate REAL NOT NULL,
-        tenure_years INTEGER NOT NULL,
-        application_date TIMESTAMPTZ DEFAULT NOW()
-    );
-    """
+    # 2. The table structure (and its indexes) is owned by db_migrations.py
     
     conn = None
     cursor = None
@@ -51,8 +40,7 @@ def create_applications_table():
         cursor = conn.cursor()
         print("Connection successful.")
         
-        cursor.execute(create_table_sql)
-        conn.commit()
+        run_migrations(conn)
         print("Table 'applications2' created successfully (or already exists).")
             
     except psycopg2.Error as e:
@@ -0,0 +1,81 @@
+import numpy as np
+
+# --- Vectorized loan math ---
+# Shared by the batch jobs and the server. Every function accepts scalars or
+# NumPy arrays and broadcasts, so a whole customer base x plan catalog can be
+# evaluated in one call.
+
+# Eligibility codes, matching customer_plan_eligibility / income_check_node:
+NOT_IN_BAND = 0   # credit score outside the plan's [min_score, max_score]
+INSTANT = 1       # amount <= pre_approved_limit
+INCOME_PROOF = 2  # amount <= 2 * pre_approved_limit
+INELIGIBLE = 3    # amount > 2 * pre_approved_limit
+
+ELIGIBILITY_LABELS = {
+    INSTANT: 'instant',
+    INCOME_PROOF: 'income_proof',
+    INELIGIBLE: 'ineligible',
+}
+
+
+def monthly_emi(amount, annual_rate, tenure_years):
+    """
+    Standard amortizing EMI: P * r * (1 + r)^n / ((1 + r)^n - 1),
+    with r the monthly rate and n the number of months. A 0% rate
+    degenerates to P / n.
+    """
+    amount = np.asarray(amount, dtype=np.float64)
+    monthly_rate = np.asarray(annual_rate, dtype=np.float64) / 100 / 12
+    months = np.asarray(tenure_years, dtype=np.float64) * 12
+
+    growth = np.power(1 + monthly_rate, months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        emi = np.where(
+            monthly_rate == 0,
+            amount / months,
+            amount * monthly_rate * growth / (growth - 1)
+        )
+    return emi
+
+
+def loan_totals(amount, annual_rate, tenure_years):
+    """Returns (monthly EMI, total payable, total interest), each rounded to paise."""
+    emi = monthly_emi(amount, annual_rate, tenure_years)
+    total_payable = emi * np.asarray(tenure_years, dtype=np.float64) * 12
+    total_interest = total_payable - np.asarray(amount, dtype=np.float64)
+    return np.round(emi, 2), np.round(total_payable, 2), np.round(total_interest, 2)
+
+
+def eligibility_matrix(credit_scores, pre_approved_limits, min_scores, max_scores, plan_amounts):
+    """
+    Classifies every (customer, plan) pair. Customer arrays have shape (C,),
+    plan arrays shape (P,); the result is a (C, P) int8 matrix of the codes above.
+    """
+    scores = np.asarray(credit_scores)[:, None]
+    limits = np.asarray(pre_approved_limits, dtype=np.int64)[:, None]
+    amounts = np.asarray(plan_amounts, dtype=np.int64)[None, :]
+
+    in_band = (scores >= np.asarray(min_scores)[None, :]) & (scores <= np.asarray(max_scores)[None, :])
+
+    codes = np.full(in_band.shape, INELIGIBLE, dtype=np.int8)
+    codes[amounts <= 2 * limits] = INCOME_PROOF
+    codes[amounts <= limits] = INSTANT
+    codes[~in_band] = NOT_IN_BAND
+    return codes
+
+
+# --- Pre-approved limit policy ---
+# ₹600 of limit per credit-score point above 550, less half of the principal
+# still outstanding on the customer's running loans, rounded down to ₹5,000.
+LIMIT_SCORE_FLOOR = 550
+LIMIT_PER_SCORE_POINT = 600
+LIMIT_EXPOSURE_WEIGHT = 0.5
+LIMIT_ROUNDING = 5000
+
+
+def pre_approved_limit_for(credit_scores, exposures=0):
+    """Pre-approved limit(s) for the given credit score(s) and outstanding exposure(s)."""
+    scores = np.asarray(credit_scores, dtype=np.int64)
+    base = np.maximum(0, scores - LIMIT_SCORE_FLOOR) * LIMIT_PER_SCORE_POINT
+    available = np.maximum(0, base - LIMIT_EXPOSURE_WEIGHT * np.asarray(exposures, dtype=np.float64))
+    return (available // LIMIT_ROUNDING * LIMIT_ROUNDING).astype(np.int64)
@@ -18,6 +18,13 @@ CREATE TABLE IF NOT EXISTS loan_options (
 );
 """
 
+# Score-band lookups filter on min_score/max_score, so index them.
+# (The Postgres schema is owned by db_migrations.py; this is the SQLite mirror.)
+create_index_sql = """
+CREATE INDEX IF NOT EXISTS loan_options_score_band_idx
+ON loan_options (min_score, max_score);
+"""
+
 # --- 3. Define 10 Mock Loan Options ---
 # (plan_name, min_score, max_score, amount, interest_rate, tenure_years)
 mock_loan_data = [
@@ -41,6 +48,7 @@ def setup_loan_options_table():
         
         # Create the table
         cursor.execute(create_table_sql)
+        cursor.execute(create_index_sql)
         print("Table 'loan_options' created successfully (or already exists).")
         
         # Insert the data
@@ -1,6 +1,7 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from db_migrations import run_migrations
 
 def setup_database():
     load_dotenv('api_secret.env')
@@ -11,17 +12,7 @@ def setup_database():
     DB_PASSWORD = os.environ.get("DB_PASSWORD")
     DB_NAME = os.environ.get("DB_NAME")
 
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS loan_options (
-        id SERIAL PRIMARY KEY,
-        plan_name TEXT NOT NULL,
-        min_score INTEGER NOT NULL,
-        max_score INTEGER NOT NULL,
-        amount INTEGER NOT NULL,
-        interest_rate INTEGER NOT NULL,
-        tenure_years INTEGER NOT NULL
-    );
-    """
+    # The table itself (and its indexes) is owned by db_migrations.py
 
     # (plan_name, min_score, max_score, amount, interest_rate, tenure_years)
     loan_data = [
@@ -60,7 +51,7 @@ def setup_database():
         cursor = conn.cursor()
         print("Connection successful.")
 
-        cursor.execute(create_table_sql)
+        run_migrations(conn)
         print("Table 'loan_options' created successfully (or already exists).")
         
         # 6. Check if table is already populated
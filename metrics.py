@@ -0,0 +1,102 @@
+import threading
+from collections import defaultdict, deque
+
+# --- In-process metrics ---
+# A tiny, dependency-free registry of counters, gauges and latency samples.
+# server.py exposes a snapshot at /metrics; the agent side uses the same
+# registry for tool and LLM call latencies and cache hit rates.
+
+# Latency percentiles are computed over the most recent samples only,
+# so memory stays bounded however long the process runs.
+MAX_SAMPLES = 10_000
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_totals = defaultdict(lambda: [0, 0.0])  # name -> [count, sum] over all time
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    """Records one sample (e.g. a latency in ms) for `name`."""
+    with _lock:
+        _samples[name].append(value)
+        totals = _totals[name]
+        totals[0] += 1
+        totals[1] += value
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(values):
+    """count/mean/p50/p95/p99/max for a list of samples."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(percentile(ordered, 0.50), 3),
+        "p95": round(percentile(ordered, 0.95), 3),
+        "p99": round(percentile(ordered, 0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def get_sample_count(name):
+    """Number of recent samples held for `name`."""
+    with _lock:
+        return len(_samples.get(name, ()))
+
+
+def get_percentile(name, fraction):
+    """Percentile of the recent samples for `name`, or None if there are none."""
+    with _lock:
+        values = sorted(_samples.get(name, ()))
+    return percentile(values, fraction)
+
+
+def snapshot():
+    """Returns every metric as a JSON-serializable dict."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        samples = {name: list(values) for name, values in _samples.items()}
+        totals = {name: tuple(total) for name, total in _totals.items()}
+
+    histograms = {}
+    for name, values in samples.items():
+        summary = summarize(values)
+        summary["total_count"], summary["total_sum"] = totals[name][0], round(totals[name][1], 3)
+        histograms[name] = summary
+
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _samples.clear()
+        _totals.clear()
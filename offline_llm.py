@@ -0,0 +1,220 @@
+"""
+Deterministic offline stand-in for Gemini (LLM_BACKEND=offline).
+
+Lets the agent graph run, be benchmarked and be load-tested with no network
+access or API key, so routing, checkpointing and tool performance can be
+measured on their own. Every prompt the agent sends gets a scripted or
+rule-derived answer:
+
+- intent check ("Respond with ONLY 'YES' or 'NO'"): intent_classifier's
+  grammar, then its naive Bayes model
+- greeting, general-chat fallback and loan questions: fixed templates
+- LoanDetails structured output: option_parser against the options in the
+  prompt, falling back to the first option
+- AddNewCustomer (or any subset of its fields): registration_parser, with
+  placeholder values for anything it can't read
+
+Each call sleeps for a latency drawn from a configurable distribution
+(milliseconds; seeded, so runs are repeatable):
+
+    OFFLINE_LLM_LATENCY=lognormal:800,0.4          # chat calls
+    OFFLINE_LLM_STRUCTURED_LATENCY=uniform:300,900 # structured output (default: same as chat)
+    OFFLINE_LLM_SEED=42
+
+Distributions: fixed:MS, uniform:LOW,HIGH, normal:MEAN,STD,
+lognormal:MEDIAN,SIGMA, exponential:MEAN. llm_gateway still applies, so
+raise LLM_RATE_PER_SECOND / LLM_MAX_CONCURRENCY for load tests.
+"""
+import os
+import re
+import math
+import time
+import random
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+import intent_classifier
+import option_parser
+import registration_parser
+
+OFFLINE_LLM_LATENCY = os.environ.get("OFFLINE_LLM_LATENCY", "fixed:0")
+OFFLINE_LLM_STRUCTURED_LATENCY = os.environ.get("OFFLINE_LLM_STRUCTURED_LATENCY", "")
+OFFLINE_LLM_SEED = int(os.environ.get("OFFLINE_LLM_SEED", "42"))
+
+# Placeholders for registration fields the rules couldn't read
+PLACEHOLDER_CUSTOMER = {
+    "customer_name": "Offline Customer",
+    "customer_phone": "9000000000",
+    "customer_address": "1 Test Street, Mumbai",
+    "credit_score": registration_parser.DEFAULT_CREDIT_SCORE,
+    "pin": "0000",
+}
+
+GREETING_REPLY = (
+    "Hello! I'm Alex, your Tata Capital personal loan assistant. "
+    "Are you an existing Tata Capital customer?"
+)
+CHAT_REPLY = (
+    "Thanks for reaching out! I'm Alex from Tata Capital. "
+    "I can help you explore personal loan offers, check your eligibility or apply. What would you like to do?"
+)
+LOAN_QUESTION_REPLY = "Here's a summary of your loan: {details}. Let me know if you'd like anything else explained."
+
+_rng = random.Random(OFFLINE_LLM_SEED)
+_rng_lock = threading.Lock()
+
+
+# --- Latency ---
+@lru_cache(maxsize=None)
+def parse_latency(spec):
+    """A 'kind:params' spec (milliseconds) as a function of a Random returning seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    samplers = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: rng.gauss(values[0], values[1]),
+        "lognormal": lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+        "exponential": lambda rng: rng.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution {spec!r}; expected one of {', '.join(samplers)}")
+    sampler = samplers[kind]
+    return lambda rng: max(sampler(rng), 0.0) / 1000
+
+
+def sample_latency(spec):
+    with _rng_lock:
+        return parse_latency(spec)(_rng)
+
+
+# --- Rule-derived answers ---
+_QUOTED_MESSAGE = re.compile(r'(?:User message|A customer just said|User Question|Message):\s*"?(.*?)"?\s*(?:\n|$)')
+_LOAN_CONTEXT = re.compile(r"Loan Details:\s*(.+)")
+_OPTIONS_BLOCK = re.compile(r"--- OPTIONS ---\s*(.*?)\s*--- END OPTIONS ---", re.DOTALL)
+_REPLY_BLOCK = re.compile(r'--- USER REPLY ---\s*"?(.*?)"?\s*--- END REPLY ---', re.DOTALL)
+_OPTION_REPR = re.compile(r"\w+\((.*?)\)")
+_FIELD_REPR = re.compile(r"(\w+)=('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[-\d.]+)")
+
+
+def _quoted_message(prompt):
+    match = _QUOTED_MESSAGE.search(prompt)
+    return match.group(1) if match else prompt
+
+
+def chat_reply(prompt):
+    """The scripted reply to a free-text prompt from Loan_agent."""
+    if "Respond with ONLY 'YES' or 'NO'" in prompt:
+        message = _quoted_message(prompt).lower()
+        wants_loan = intent_classifier.classify_grammar(message)
+        if wants_loan is None:
+            wants_loan = intent_classifier.predict(intent_classifier.get_model(), message)[0] == "YES"
+        return "YES" if wants_loan else "NO"
+    if "Greet the user" in prompt:
+        return GREETING_REPLY
+    if "helpful loan advisor" in prompt:
+        context = _LOAN_CONTEXT.search(prompt)
+        return LOAN_QUESTION_REPLY.format(details=context.group(1).strip() if context else "see your schedule above")
+    return CHAT_REPLY
+
+
+def _presented_options(prompt):
+    """The options listed in extraction_node's prompt (reprs of LoanDetails) as dicts."""
+    block = _OPTIONS_BLOCK.search(prompt)
+    if not block:
+        return []
+    options = []
+    for option in _OPTION_REPR.findall(block.group(1)):
+        fields = {}
+        for name, value in _FIELD_REPR.findall(option):
+            fields[name] = value[1:-1] if value[0] in "'\"" else float(value)
+        options.append(fields)
+    return options
+
+
+def loan_selection(prompt):
+    options = _presented_options(prompt)
+    if not options:
+        raise ValueError("Offline LLM: no loan options found in the prompt")
+    reply = _REPLY_BLOCK.search(prompt)
+    selection = option_parser.parse_selection(reply.group(1) if reply else "", options)
+    return options[selection.index if selection.index is not None else 0]
+
+
+def customer_details(prompt):
+    message = _quoted_message(prompt) if 'Message: "' in prompt else prompt
+    return {**PLACEHOLDER_CUSTOMER, **registration_parser.parse(message).fields}
+
+
+def structured_reply(schema, prompt):
+    """An instance of `schema` (LoanDetails, AddNewCustomer or a subset of it) for `prompt`."""
+    fields = set(schema.model_fields)
+    if {"plan_name", "amount"} <= fields:
+        values = loan_selection(prompt)
+    elif fields <= set(PLACEHOLDER_CUSTOMER):
+        values = customer_details(prompt)
+    else:
+        raise ValueError(f"Offline LLM has no rule for {schema.__name__}")
+    return schema(**{name: values[name] for name in fields if name in values})
+
+
+# --- Chat model ---
+def _prompt_text(messages):
+    return "\n".join(m.content for m in messages if isinstance(m.content, str))
+
+
+class OfflineChatModel(BaseChatModel):
+    """A chat model answering from the rules above after an artificial delay."""
+
+    latency: str = OFFLINE_LLM_LATENCY
+    structured_latency: str = OFFLINE_LLM_STRUCTURED_LATENCY
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(sample_latency(self.latency))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=chat_reply(_prompt_text(messages))))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(sample_latency(self.latency))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=chat_reply(_prompt_text(messages))))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any):
+        # The whole delay is time to first token; the words then follow at once
+        time.sleep(sample_latency(self.latency))
+        for word in re.findall(r"\S+\s*", chat_reply(_prompt_text(messages))):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        latency = self.structured_latency or self.latency
+
+        def run(input):
+            time.sleep(sample_latency(latency))
+            return structured_reply(schema, _input_text(input))
+
+        async def arun(input):
+            await asyncio.sleep(sample_latency(latency))
+            return structured_reply(schema, _input_text(input))
+
+        return RunnableLambda(run, afunc=arun, name=f"offline_{schema.__name__}")
+
+
+def _input_text(input):
+    if isinstance(input, str):
+        return input
+    if isinstance(input, list):
+        return _prompt_text(input)
+    return str(input)
@@ -0,0 +1,186 @@
+"""
+Deterministic parser for the user's pick from the presented loan options.
+
+extraction_node used to send every selection reply to structured_llm. Most
+replies are trivial ("option 2", "the second one", "2", "the 30k one",
+"prime plus"), so they're resolved here against the presented list:
+
+- ordinals and positions: "first", "2nd", "last", "option 3", "#2", "2"
+- amounts: 30000, 30,000, ₹30k, 1 lakh, 1.5L, 50 thousand
+- tenure and rate qualifiers: "5 years", "8.5%"
+- plan names, fuzzily (difflib), so "prime plus" and "prme plus" both match
+
+Every signal narrows the set of candidate options; a reply is parsed only
+when they leave exactly one. Anything else (no signal, conflicting signals,
+negations, "or", comparisons) returns None and the caller asks the LLM.
+Outcomes are counted in metrics as option_parser.parsed and
+option_parser.llm_fallback, with the running option_parser.fallback_rate.
+"""
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import NamedTuple, Optional
+import metrics
+
+NAME_MATCH_THRESHOLD = 0.8
+NAME_MATCH_MARGIN = 0.1  # best plan name must beat the runner-up by this much
+
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+}
+CARDINALS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+AMOUNT_MULTIPLIERS = {
+    "k": 1_000, "thousand": 1_000,
+    "l": 100_000, "lac": 100_000, "lacs": 100_000, "lakh": 100_000, "lakhs": 100_000,
+    "cr": 10_000_000, "crore": 10_000_000, "crores": 10_000_000,
+}
+
+# Replies that reject, compare or hedge between options are left to the LLM.
+AMBIGUOUS = re.compile(
+    r"\b(?:not|no|don'?t|dont|instead|rather|or|either|neither|nor|vs|versus|compare|between|"
+    r"which|better|cheaper|difference|but|except)\b"
+)
+
+_ORDINAL_WORDS = "|".join(ORDINALS)
+_CARDINAL_WORDS = "|".join(CARDINALS)
+POSITION = re.compile(
+    rf"\b(?:option|plan|choice|number)\s*(\d+|{_CARDINAL_WORDS}|{_ORDINAL_WORDS})\b"
+    r"|#\s*(\d+)\b"
+    r"|\b(\d+)(?:st|nd|rd|th)\b"
+    rf"|\b({_ORDINAL_WORDS}|last)\b"
+)
+NUMBER = re.compile(
+    r"(\d+(?:,\d{2,3})*(?:\.\d+)?)\s*"
+    r"(k|thousand|lakhs?|lacs?|l|crores?|cr|%|percent|years?|yrs?|y)?(?![a-z0-9])"
+)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class Selection(NamedTuple):
+    index: Optional[int]  # position in the presented list; None: ask the LLM
+    reason: str
+
+
+def _field(option, name):
+    return option[name] if isinstance(option, dict) else getattr(option, name)
+
+
+def _to_number(text):
+    return float(text.replace(",", ""))
+
+
+def _positions(text, count):
+    """1-based positions the reply refers to ("second", "option 2", "#2", "2nd", "last")."""
+    positions = set()
+    for match in POSITION.finditer(text):
+        token = next(group for group in match.groups() if group)
+        if token == "last":
+            positions.add(count)
+        elif token.isdigit():
+            positions.add(int(token))
+        else:
+            positions.add(ORDINALS.get(token) or CARDINALS[token])
+    return positions
+
+
+def _quantities(text, count):
+    """
+    Amounts, tenures and rates mentioned in the reply. A plain small number
+    ("I'll take 2") is read as a position; any other unitless number (the
+    "8.5 one", "the 50 one") can't be placed and is reported as unknown.
+    """
+    amounts, tenures, rates, positions = set(), set(), set(), set()
+    unknown = False
+    for match in NUMBER.finditer(POSITION.sub(" ", text)):
+        value, unit = _to_number(match.group(1)), match.group(2)
+        if unit in AMOUNT_MULTIPLIERS:
+            amounts.add(round(value * AMOUNT_MULTIPLIERS[unit]))
+        elif unit in ("%", "percent"):
+            rates.add(value)
+        elif unit:
+            tenures.add(value)
+        elif value >= 1000:
+            amounts.add(round(value))
+        elif value.is_integer() and 1 <= value <= count:
+            positions.add(int(value))
+        else:
+            unknown = True
+    return amounts, tenures, rates, positions, unknown
+
+
+def _name_scores(text, options):
+    """Best fuzzy similarity of each plan name to any same-length run of words in the reply."""
+    words = _WORD.findall(text)
+    scores = []
+    for option in options:
+        name = " ".join(_WORD.findall(_field(option, "plan_name").lower()))
+        width = len(name.split())
+        windows = [" ".join(words[i:i + width]) for i in range(max(len(words) - width + 1, 1))]
+        scores.append(max(SequenceMatcher(None, name, window).ratio() for window in windows))
+    return scores
+
+
+def parse_selection(reply, options):
+    """The option `reply` picks out of `options`, or Selection(None, reason) if it's ambiguous."""
+    text = reply.lower().strip()
+    count = len(options)
+    if not text or not count:
+        return Selection(None, "empty")
+    if AMBIGUOUS.search(text):
+        return Selection(None, "ambiguous wording")
+
+    positions = _positions(text, count)
+    amounts, tenures, rates, bare_positions, unknown = _quantities(text, count)
+    if unknown:
+        return Selection(None, "unrecognised number")
+    positions |= bare_positions
+    if len(positions) > 1:
+        return Selection(None, "several positions")
+
+    candidates = set(range(count))
+    signals = 0
+    if positions:
+        position = positions.pop()
+        if not 1 <= position <= count:
+            return Selection(None, "position out of range")
+        candidates &= {position - 1}
+        signals += 1
+    for values, field in ((amounts, "amount"), (tenures, "tenure_years"), (rates, "interest_rate")):
+        if values:
+            candidates &= {i for i, option in enumerate(options) if float(_field(option, field)) in values}
+            signals += 1
+
+    scores = _name_scores(text, options)
+    ranked = sorted(range(count), key=lambda i: scores[i], reverse=True)
+    best = ranked[0]
+    runner_up = scores[ranked[1]] if count > 1 else 0.0
+    if scores[best] >= NAME_MATCH_THRESHOLD and scores[best] - runner_up >= NAME_MATCH_MARGIN:
+        candidates &= {best}
+        signals += 1
+
+    if not signals:
+        return Selection(None, "no option mentioned")
+    if len(candidates) != 1:
+        return Selection(None, "no single option matches")
+    return Selection(candidates.pop(), "parsed")
+
+
+_lock = threading.Lock()
+_parsed = 0
+_total = 0
+
+
+def record(selection):
+    """Counts a parse outcome and updates option_parser.fallback_rate."""
+    global _parsed, _total
+    parsed = selection.index is not None
+    metrics.increment("option_parser.parsed" if parsed else "option_parser.llm_fallback")
+    with _lock:
+        _total += 1
+        _parsed += parsed
+        metrics.set_gauge("option_parser.fallback_rate", round(1 - _parsed / _total, 4))
@@ -0,0 +1,140 @@
+"""
+Nightly pre-approved limit recalculation.
+
+Streams every customer, with the principal still outstanding on their running
+loans in applications2, through a server-side cursor. New limits are computed
+per chunk with the vectorized policy in loan_math.pre_approved_limit_for, and
+only the customers whose limit changed are written back, with batched
+UPDATE ... FROM (VALUES ...) statements.
+
+Each batch commits on its own with a short lock_timeout, so the job never
+holds row locks for long and never waits behind a busy customer row. Reads
+(/crm/verify, /crm/customer360) are never blocked by the updates.
+
+    python recalculate_limits.py
+    python recalculate_limits.py --dry-run
+"""
+import argparse
+import time
+
+import numpy as np
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+
+import loan_math
+from db_config import get_connection
+
+# Customers that are current on no loan have zero exposure. A loan counts as
+# running until application_date + tenure_years; its outstanding principal is
+# approximated linearly over the tenure.
+CUSTOMER_EXPOSURE_QUERY = """
+    SELECT c.id, c.credit_score, c.pre_approved_limit, COALESCE(e.outstanding, 0)
+    FROM customers c
+    LEFT JOIN (
+        SELECT customer_id,
+               SUM(amount * (1 - EXTRACT(EPOCH FROM NOW() - application_date)
+                                 / EXTRACT(EPOCH FROM make_interval(years => tenure_years)))) AS outstanding
+        FROM applications2
+        WHERE application_date > NOW() - make_interval(years => tenure_years)
+        GROUP BY customer_id
+    ) e ON e.customer_id = c.id
+    ORDER BY c.id
+"""
+
+UPDATE_LIMITS_QUERY = """
+    UPDATE customers AS c
+    SET pre_approved_limit = v.pre_approved_limit
+    FROM (VALUES %s) AS v(id, pre_approved_limit)
+    WHERE c.id = v.id AND c.pre_approved_limit IS DISTINCT FROM v.pre_approved_limit
+"""
+
+# How long a batch may wait for a row lock before it is retried
+LOCK_TIMEOUT = '2s'
+MAX_BATCH_ATTEMPTS = 3
+
+
+# --- 1. Policy ---
+def compute_changes(customer_ids, credit_scores, current_limits, exposures):
+    """Returns (ids, new_limits) for the customers in the chunk whose limit changes."""
+    new_limits = loan_math.pre_approved_limit_for(credit_scores, exposures)
+    changed = new_limits != current_limits
+    return customer_ids[changed], new_limits[changed]
+
+
+# --- 2. Write-back ---
+def write_batch(conn, ids, limits):
+    """
+    Applies one batch in its own short transaction. Lock timeouts (a customer
+    row busy in another transaction) are retried; returns the rows updated.
+    """
+    values = list(zip(ids.tolist(), limits.tolist()))
+    for attempt in range(1, MAX_BATCH_ATTEMPTS + 1):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                execute_values(cursor, UPDATE_LIMITS_QUERY, values, page_size=len(values))
+                updated = cursor.rowcount
+            conn.commit()
+            return updated
+        except errors.LockNotAvailable:
+            conn.rollback()
+            print(f"  Batch starting at id {values[0][0]} hit a lock (attempt {attempt}/{MAX_BATCH_ATTEMPTS}).")
+            time.sleep(attempt)
+    raise RuntimeError(f"Gave up on the batch starting at id {values[0][0]} after {MAX_BATCH_ATTEMPTS} attempts.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Customers fetched and evaluated per chunk")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="Rows per UPDATE transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Report how many limits would change without writing")
+    args = parser.parse_args()
+
+    # The read side holds one long snapshot for the server-side cursor; the
+    # write side commits every batch.
+    read_conn = get_connection()
+    write_conn = get_connection()
+    try:
+        started = time.perf_counter()
+        total_customers = total_changed = total_updated = 0
+
+        with read_conn.cursor(name="recalculate_limits") as cursor:
+            cursor.execute(CUSTOMER_EXPOSURE_QUERY)
+            while True:
+                rows = cursor.fetchmany(args.chunk_size)
+                if not rows:
+                    break
+
+                chunk = np.array(rows, dtype=np.float64)
+                ids, limits = compute_changes(
+                    chunk[:, 0].astype(np.int64), chunk[:, 1], chunk[:, 2].astype(np.int64), chunk[:, 3]
+                )
+                total_customers += len(chunk)
+                total_changed += len(ids)
+
+                if not args.dry_run:
+                    for offset in range(0, len(ids), args.batch_size):
+                        total_updated += write_batch(
+                            write_conn, ids[offset:offset + args.batch_size], limits[offset:offset + args.batch_size]
+                        )
+
+                elapsed = time.perf_counter() - started
+                print(f"  {total_customers:>12,} customers, {total_changed:>10,} limits changed "
+                      f"({total_customers / elapsed:,.0f} customers/s)")
+        read_conn.commit()
+
+        elapsed = time.perf_counter() - started
+        if args.dry_run:
+            print(f"Dry run: {total_changed:,} of {total_customers:,} limits would change ({elapsed:.1f}s).")
+        else:
+            print(f"Done: updated {total_updated:,} of {total_customers:,} limits in {elapsed:.1f}s.")
+    except Exception:
+        write_conn.rollback()
+        raise
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+
+if __name__ == "__main__":
+    main()
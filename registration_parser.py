@@ -0,0 +1,166 @@
+"""
+Rule-based extractor for new-customer registration details.
+
+The registration prompt asks for one message like
+    "My name is John Doe, my phone number is 9087033224, I live at 123 Main St
+     Chennai, my credit score is 720, and my PIN is 1234"
+so most replies are well-formed enough to read without the LLM. parse()
+pulls out the fields of Loan_agent.AddNewCustomer it is confident about and
+lists the rest as missing; add_customer_node asks customer_data_llm for the
+missing fields only.
+
+- phone:   one 10-digit number (optionally +91 / 0 prefixed, spaces or dashes allowed)
+- pin:     4 digits after "pin", or the only standalone 4-digit number
+- score:   300-900 next to "score"/"cibil"; DEFAULT_CREDIT_SCORE if no
+           score is mentioned at all (the prompt promises an estimate)
+- name and address: only after their explicit cue phrases ("my name is",
+  "I live at"); a name with a stopword in it ("Anil from Mumbai") is
+  rejected, and the phone number and PIN are stripped from the address.
+  Replies without cues ("John Doe, 9087033224, 123 Main St Chennai") leave
+  both to the LLM rather than guessing which segment is which.
+
+Outcomes are counted in metrics as registration_parser.complete (no LLM
+call) and registration_parser.partial (some fields left to the LLM).
+"""
+import re
+from typing import NamedTuple
+import metrics
+
+FIELDS = ("customer_name", "customer_phone", "customer_address", "credit_score", "pin")
+
+DEFAULT_CREDIT_SCORE = 650
+MIN_CREDIT_SCORE = 300
+MAX_CREDIT_SCORE = 900
+MAX_NAME_WORDS = 5
+
+PHONE = re.compile(r"(?<![\d+])(?:\+91[\s-]?|0)?(\d{5})[\s-]?(\d{5})(?!\d)")
+PIN = re.compile(r"\b(?:login\s+)?pin(?:\s+(?:number|no\.?))?\s*(?:is|:|=|-)?\s*(\d{4})(?!\d)", re.IGNORECASE)
+FOUR_DIGITS = re.compile(r"(?<!\d)(\d{4})(?!\d)")
+SCORE = re.compile(
+    r"\b(?:credit\s+score|cibil(?:\s+score)?|score)\s*(?:is|of|:|=|-)?\s*(?:around\s+|about\s+)?(\d{3})(?!\d)"
+    r"|(?<!\d)(\d{3})(?!\d)\s*(?:is\s+my\s+)?(?:credit\s+score|cibil)",
+    re.IGNORECASE,
+)
+SCORE_MENTION = re.compile(r"\b(?:score|cibil)\b", re.IGNORECASE)
+THREE_DIGITS = re.compile(r"(?<![\d.])(\d{3})(?![\d.])")
+
+# A cue phrase, then the value up to the next field's cue or the end.
+_NEXT_FIELD = (
+    r"\s*(?:[,;.]\s*)?(?:and\s+)?(?:my\s+|i\s+live|i\s+stay|phone|mobile|number|address|"
+    r"credit|score|cibil|pin|login)|\s*[;\n]|\s*$"
+)
+# Names never contain commas, so a comma ends one too ("my name is Ravi, 98765...").
+# "I am" / "this is" aren't cues: they're as often "I am interested in a loan".
+NAME = re.compile(
+    r"\b(?:my\s+name\s+is|name\s*(?:is|:|-))\s+([a-z][a-z .'-]*?)(?=\s*,|" + _NEXT_FIELD + ")",
+    re.IGNORECASE,
+)
+ADDRESS = re.compile(
+    r"\b(?:i\s+live\s+(?:at|in)|i\s+stay\s+(?:at|in)|(?:my\s+)?address\s*(?:is|:|-)|residing\s+at|located\s+at)"
+    r"\s+(.+?)(?=" + _NEXT_FIELD + ")",
+    re.IGNORECASE,
+)
+_NAME_WORD = re.compile(r"^[a-z][a-z.'-]*$", re.IGNORECASE)
+_DIGITS_ONLY = re.compile(r"^[\d\s+-]+$")
+_FIELD_WORDS = re.compile(r"\b(?:pin|score|cibil|phone|mobile)\b", re.IGNORECASE)
+# Words that never appear in a person's name ("Anil from Mumbai", "Interested In A Loan")
+_NAME_STOPWORDS = {
+    "a", "an", "the", "in", "from", "at", "of", "on", "to", "for", "and", "with", "by", "near",
+    "is", "am", "are", "i", "my", "me", "interested", "looking", "loan", "loans", "credit",
+    "stay", "live", "living", "here", "customer", "new", "not", "want", "need",
+}
+
+
+class RegistrationParse(NamedTuple):
+    fields: dict   # confidently extracted AddNewCustomer fields
+    missing: list  # fields to ask the LLM for, in FIELDS order
+
+
+def _plausible_name(value):
+    words = value.split()
+    return (
+        0 < len(words) <= MAX_NAME_WORDS
+        and all(_NAME_WORD.match(word) for word in words)
+        and not any(word.lower().strip(".") in _NAME_STOPWORDS for word in words)
+    )
+
+
+def _clean(value):
+    return value.strip(" ,.;:-")
+
+
+def _phone(text):
+    numbers = {a + b for a, b in PHONE.findall(text)}
+    return numbers.pop() if len(numbers) == 1 else None
+
+
+def _pin(text, phone):
+    match = PIN.search(text)
+    if match:
+        return match.group(1)
+    # Otherwise the only 4-digit number that isn't part of the phone number
+    candidates = {n for n in FOUR_DIGITS.findall(text) if not (phone and n in phone)}
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def _address(value, phone, pin):
+    """The cued address with any phone number, PIN and digit-only segments taken out."""
+    value = PIN.sub(" ", PHONE.sub(" ", value))
+    if pin:
+        value = re.sub(rf"(?<!\d){pin}(?!\d)", " ", value)
+    parts = [_clean(part) for part in re.split(r"[,;\n]", value)]
+    return ", ".join(part for part in parts if part and not _DIGITS_ONLY.match(part))
+
+
+def _credit_score(text):
+    scores = {int(a or b) for a, b in SCORE.findall(text)}
+    if len(scores) == 1:
+        score = scores.pop()
+        return score if MIN_CREDIT_SCORE <= score <= MAX_CREDIT_SCORE else None
+    # No score mentioned at all, not even a bare 3-digit number: use the
+    # estimate the registration prompt promises
+    if not scores and not SCORE_MENTION.search(text) and not THREE_DIGITS.search(text):
+        return DEFAULT_CREDIT_SCORE
+    return None
+
+
+def _segment_score(text):
+    """A lone 3-digit segment of a comma-separated reply ("John Doe, 9087033224, 720, 1234")."""
+    scores = [int(part) for part in map(_clean, re.split(r"[,;\n]", text)) if re.fullmatch(r"\d{3}", part)]
+    return scores[0] if len(scores) == 1 and MIN_CREDIT_SCORE <= scores[0] <= MAX_CREDIT_SCORE else None
+
+
+def parse(message):
+    """Extracts what it can from a registration message; see RegistrationParse."""
+    fields = {}
+
+    phone = _phone(message)
+    if phone:
+        fields["customer_phone"] = phone
+
+    pin = _pin(message, phone)
+    if pin:
+        fields["pin"] = pin
+
+    score = _credit_score(message)
+    if score is not None:
+        fields["credit_score"] = score
+
+    if "credit_score" not in fields:
+        segment_score = _segment_score(message)
+        if segment_score is not None:
+            fields["credit_score"] = segment_score
+
+    name_match = NAME.search(message)
+    address_match = ADDRESS.search(message)
+    name = _clean(name_match.group(1)) if name_match else None
+    address = _address(address_match.group(1), phone, pin) if address_match else None
+
+    if name and _plausible_name(name):
+        fields["customer_name"] = name.title() if name.islower() else name
+    if address and any(ch.isalpha() for ch in address):
+        fields["customer_address"] = address
+
+    missing = [field for field in FIELDS if field not in fields]
+    metrics.increment("registration_parser.partial" if missing else "registration_parser.complete")
+    return RegistrationParse(fields, missing)
@@ -0,0 +1,194 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import metrics
+
+# --- Response cache for general-chat LLM replies ---
+# SalesAgent's fallback sends unmatched messages to the LLM, and most of them
+# are the same handful of greetings, thanks and "what do you do" questions.
+# Replies are cached under a normalized form of the message, with TTL and
+# LRU eviction. Only messages matching CACHEABLE_PATTERNS (generic small talk,
+# no digits) are ever stored or served, so nothing personalized (names,
+# phone numbers, amounts) can leak from one customer's turn into another's.
+#
+# With RESPONSE_CACHE_EMBEDDINGS=true and sentence-transformers installed,
+# a miss on the exact key falls back to the most similar cached message
+# (cosine similarity >= RESPONSE_CACHE_SIMILARITY), so "hello there!" can be
+# answered with the reply cached for "hello".
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+RESPONSE_CACHE_EMBEDDINGS = os.environ.get("RESPONSE_CACHE_EMBEDDINGS", "false").lower() == "true"
+RESPONSE_CACHE_EMBEDDING_MODEL = os.environ.get("RESPONSE_CACHE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.92"))
+
+CACHEABLE_PATTERNS = [re.compile(p) for p in [
+    r"^(?:hi|hii|hello|hey|namaste|good (?:morning|afternoon|evening))(?: there| all| team)?$",
+    r"^(?:ok |okay )?(?:thanks|thank you|thank you so much|thanks a lot|thx|ty|great thanks|ok thanks)$",
+    r"^(?:bye|goodbye|see you|see ya|good night|take care)$",
+    r"^(?:ok|okay|cool|great|nice|alright|got it|sure|fine)$",
+    r"^how are you(?: doing)?(?: today)?$",
+    r"^(?:who are you|what are you|what is your name|whats your name|what's your name)$",
+    r"^(?:what do you do|what can you do|how can you help(?: me)?|what can you help (?:me )?with|what services do you offer)$",
+]]
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+_WHITESPACE = re.compile(r"\s+")
+_REPEATED = re.compile(r"(\w)\1{2,}")  # "hiiii" -> "hii"
+
+
+def normalize(message):
+    """Lowercase, punctuation stripped, whitespace collapsed, long letter runs shortened."""
+    text = _PUNCTUATION.sub(" ", message.lower())
+    text = _REPEATED.sub(r"\1\1", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def is_cacheable(key):
+    return not any(ch.isdigit() for ch in key) and any(p.match(key) for p in CACHEABLE_PATTERNS)
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache from normalized messages to replies."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 use_embeddings=RESPONSE_CACHE_EMBEDDINGS, name="response_cache"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries = OrderedDict()  # key -> (expires_at, reply)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+        self._use_embeddings = use_embeddings
+        self._index = None  # loaded on first use; the embedding model is slow to load
+
+    def _get_index(self):
+        if self._use_embeddings and self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = _EmbeddingIndex()
+            if not self._index.available:
+                self._use_embeddings = False
+        return self._index if self._use_embeddings else None
+
+    def _record(self, outcome):
+        metrics.increment(f"{self.name}.{outcome}")
+        with self._lock:
+            self._lookups += 1
+            self._hits += outcome.endswith("hit")
+            metrics.set_gauge(f"{self.name}.hit_rate", round(self._hits / self._lookups, 4))
+
+    def _get_entry(self, key):
+        # Caller holds the lock. Expired entries are dropped on read.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def get(self, message):
+        """The cached reply for `message`, or None."""
+        key = normalize(message)
+        if not is_cacheable(key):
+            self._record("uncacheable")
+            return None
+
+        with self._lock:
+            reply = self._get_entry(key)
+        if reply is not None:
+            self._record("exact_hit")
+            return reply
+
+        index = self._get_index()
+        if index is not None:
+            similar_key = index.nearest(key, RESPONSE_CACHE_SIMILARITY)
+            if similar_key is not None:
+                with self._lock:
+                    reply = self._get_entry(similar_key)
+                if reply is not None:
+                    self._record("similar_hit")
+                    return reply
+
+        self._record("miss")
+        return None
+
+    def put(self, message, reply):
+        key = normalize(message)
+        if not is_cacheable(key) or not reply:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, reply)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        metrics.increment(f"{self.name}.stores")
+
+        index = self._get_index()
+        if index is not None:
+            index.add(key)
+            for old_key in evicted:
+                index.remove(old_key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _EmbeddingIndex:
+    """
+    Brute-force cosine-similarity index over the cached keys. The cache only
+    holds short small-talk messages, so a flat matrix scan is plenty.
+    """
+
+    def __init__(self, model_name=RESPONSE_CACHE_EMBEDDING_MODEL):
+        self.available = False
+        try:
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("Response cache: sentence-transformers not installed; using exact-match keys only.")
+            return
+
+        self._np = np
+        self._model = SentenceTransformer(model_name)
+        self._keys = []
+        self._vectors = None
+        self._lock = threading.Lock()
+        self.available = True
+
+    def _embed(self, text):
+        return self._model.encode([text], normalize_embeddings=True)[0]
+
+    def add(self, key):
+        vector = self._embed(key)
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.append(key)
+            self._vectors = vector[None, :] if self._vectors is None else self._np.vstack([self._vectors, vector])
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self._keys:
+                return
+            index = self._keys.index(key)
+            del self._keys[index]
+            self._vectors = self._np.delete(self._vectors, index, axis=0) if self._keys else None
+
+    def nearest(self, key, threshold):
+        """The most similar indexed key if its cosine similarity is >= threshold."""
+        vector = self._embed(key)
+        with self._lock:
+            if self._vectors is None:
+                return None
+            similarities = self._vectors @ vector
+            best = int(similarities.argmax())
+            return self._keys[best] if similarities[best] >= threshold else None
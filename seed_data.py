@@ -0,0 +1,247 @@
+"""
+Synthetic data generator for load testing and capacity planning.
+
+Generates realistic customers (unique phones, PINs, credit-score distribution,
+pre-approved limits) and historical applications2 rows, and streams them into
+Postgres with COPY FROM STDIN in parallel chunks. Output is deterministic for
+a given --seed, --as-of date (the end of the application history; defaults to
+today, UTC) and starting database (ids continue from the current max).
+
+    python seed_data.py --customers 1000000 --workers 4 --seed 42 --as-of 2025-01-01
+"""
+import argparse
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+from db_config import get_connection
+from db_migrations import run_migrations
+from id_generator import uuid7
+
+# --- 1. Reference Data ---
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+    'Priya', 'Ananya', 'Diya', 'Isha', 'Kavya', 'Meera', 'Nisha', 'Pooja', 'Sneha', 'Zara',
+    'Amit', 'Karan', 'Vikram', 'Rahul', 'Siddharth', 'Neha', 'Riya', 'Tanvi', 'Aisha', 'Fatima',
+]
+LAST_NAMES = [
+    'Sharma', 'Gupta', 'Singh', 'Reddy', 'Kumar', 'Bose', 'Khan', 'Malhotra', 'Patel', 'Iyer',
+    'Nair', 'Menon', 'Das', 'Chatterjee', 'Mehta', 'Joshi', 'Kapoor', 'Verma', 'Rao', 'Pillai',
+]
+STREETS = [
+    'MG Road', 'Main St', 'Park Ave', 'Jubilee Hills', 'Anna Salai', 'Salt Lake', 'Koregaon Park',
+    'Linking Road', 'CG Road', 'Brigade Road', 'Residency Road', 'Church Street', 'Ring Road',
+]
+CITIES = [
+    'Bangalore', 'Delhi', 'Mumbai', 'Hyderabad', 'Chennai', 'Kolkata', 'Pune', 'Noida',
+    'Ahmedabad', 'Jaipur', 'Lucknow', 'Kochi', 'Indore', 'Chandigarh',
+]
+
+# Seeded phones live in 60xxxxxxxx, which none of the mock customers use.
+# A multiplicative permutation of the customer id keeps them unique without
+# remembering which numbers have been handed out, as long as every seeded id
+# is below PHONE_SPACE (main() refuses runs that would go past it).
+PHONE_PREFIX = 6_000_000_000
+PHONE_SPACE = 100_000_000
+PHONE_MULTIPLIER = 48_271  # coprime with PHONE_SPACE, so the mapping is a bijection
+
+# Number of historical applications per customer and how likely each is
+APPLICATION_COUNTS = [0, 1, 2, 3]
+APPLICATION_WEIGHTS = [0.55, 0.30, 0.10, 0.05]
+
+
+def seeded_phone(index):
+    return str(PHONE_PREFIX + (index * PHONE_MULTIPLIER + 7) % PHONE_SPACE)
+
+
+def seeded_credit_score(rng):
+    """Roughly bell-shaped around 715, clipped to the 300-900 bureau range."""
+    return int(min(900, max(300, rng.gauss(715, 60))))
+
+
+def seeded_pre_approved_limit(rng, credit_score):
+    """Higher scores get higher limits, with some spread; rounded to ₹5,000."""
+    base = max(0, credit_score - 550) * 600
+    limit = base * rng.lognormvariate(0, 0.35)
+    return int(round(limit / 5000) * 5000)
+
+
+# --- 2. Chunk Generation ---
+def _customer_rows(rng, first_id, count):
+    for offset in range(count):
+        customer_id = first_id + offset
+        credit_score = seeded_credit_score(rng)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+        yield (
+            customer_id,
+            name,
+            seeded_phone(customer_id),
+            address,
+            seeded_pre_approved_limit(rng, credit_score),
+            credit_score,
+            f"{rng.randint(0, 9999):04d}",
+        )
+
+
+def _application_rows(rng, customers, plans, history_start, history_seconds):
+    for customer in customers:
+        customer_id, credit_score = customer[0], customer[5]
+        eligible = [p for p in plans if p['min_score'] <= credit_score <= p['max_score']]
+        if not eligible:
+            continue
+
+        for _ in range(rng.choices(APPLICATION_COUNTS, APPLICATION_WEIGHTS)[0]):
+            plan = rng.choice(eligible)
+            applied_at = history_start + timedelta(seconds=rng.uniform(0, history_seconds))
+            yield (
+                uuid7(int(applied_at.timestamp() * 1000), rng),
+                customer_id,
+                plan['plan_name'],
+                plan['amount'],
+                plan['interest_rate'],
+                plan['tenure_years'],
+                applied_at.isoformat(),
+            )
+
+
+def _to_copy_buffer(rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def load_chunk(seed, chunk_index, first_id, count, plans, history_start, history_seconds):
+    """
+    Generates one chunk of customers (and their applications) and COPYs it in
+    its own transaction. Runs in a worker process with its own connection.
+    The RNG is derived from (seed, chunk_index), so the worker count doesn't
+    change the data.
+    """
+    rng = random.Random(f"{seed}:{chunk_index}")
+    customers = list(_customer_rows(rng, first_id, count))
+    applications = list(_application_rows(rng, customers, plans, history_start, history_seconds))
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY customers (id, name, phone, address, pre_approved_limit, credit_score, pin) FROM STDIN",
+                _to_copy_buffer(customers)
+            )
+            cursor.copy_expert(
+                "COPY applications2 (application_id, customer_id, plan_name, amount, interest_rate, "
+                "tenure_years, application_date) FROM STDIN",
+                _to_copy_buffer(applications)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return len(customers), len(applications)
+
+
+# --- 3. Orchestration ---
+def prepare(conn, history_start, history_end):
+    """Migrates, loads the plan catalog, makes partitions and returns (plans, first free id)."""
+    run_migrations(conn)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT plan_name, min_score, max_score, amount, interest_rate, tenure_years FROM loan_options"
+        )
+        columns = [c[0] for c in cursor.description]
+        plans = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT ensure_applications2_partitions(%s, %s)",
+            (history_start.date(), history_end.date())
+        )
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM customers")
+        first_id = cursor.fetchone()[0]
+    conn.commit()
+
+    if not plans:
+        print("Warning: loan_options is empty (run loan_setup_db.py first); no applications will be generated.")
+    return plans, first_id
+
+
+def finish(conn):
+    """Moves the customers id sequence past the explicit ids we COPYed and refreshes stats."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('customers', 'id'), (SELECT MAX(id) FROM customers))"
+        )
+    conn.commit()
+
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE customers")
+        cursor.execute("ANALYZE applications2")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100_000, help="Number of customers to generate")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Customers per COPY transaction")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel loader processes")
+    parser.add_argument("--months", type=int, default=24, help="Months of application history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=datetime.now(timezone.utc).date(),
+                        help="End of the application history, YYYY-MM-DD (default: today, UTC)")
+    args = parser.parse_args()
+
+    if args.customers > PHONE_SPACE:
+        parser.error(f"--customers can't exceed {PHONE_SPACE:,} (size of the seeded phone range)")
+
+    history_end = datetime(args.as_of.year, args.as_of.month, args.as_of.day, tzinfo=timezone.utc)
+    history_start = history_end - timedelta(days=30 * args.months)
+    history_seconds = (history_end - history_start).total_seconds()
+
+    conn = get_connection()
+    try:
+        plans, first_id = prepare(conn, history_start, history_end)
+        if first_id + args.customers > PHONE_SPACE:
+            parser.error(f"ids {first_id:,}-{first_id + args.customers - 1:,} would go past {PHONE_SPACE - 1:,}, "
+                         f"the last id with its own seeded phone number")
+        print(f"Seeding {args.customers:,} customers from id {first_id} "
+              f"with {args.workers} worker(s), seed={args.seed}, as of {args.as_of}...")
+
+        started = time.perf_counter()
+        total_customers = total_applications = 0
+
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = []
+            for chunk_index, offset in enumerate(range(0, args.customers, args.chunk_size)):
+                count = min(args.chunk_size, args.customers - offset)
+                futures.append(executor.submit(
+                    load_chunk, args.seed, chunk_index, first_id + offset, count,
+                    plans, history_start, history_seconds
+                ))
+
+            for future in as_completed(futures):
+                customers, applications = future.result()
+                total_customers += customers
+                total_applications += applications
+                elapsed = time.perf_counter() - started
+                print(f"  {total_customers:>12,} customers, {total_applications:>12,} applications "
+                      f"({total_customers / elapsed:,.0f} customers/s)")
+
+        finish(conn)
+        elapsed = time.perf_counter() - started
+        print(f"Done: {total_customers:,} customers and {total_applications:,} applications in {elapsed:.1f}s.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
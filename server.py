@@ -1,12 +1,27 @@
 import os
+import json
+import base64
+import time
+import tempfile
+import threading
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from psycopg2.pool import SimpleConnectionPool
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional
+from uuid import UUID, uuid4
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 from pydantic import BaseModel
 from psycopg2.extras import Json
+from db_migrations import run_migrations, ensure_future_partitions
+from id_generator import uuid7, uuid7_timestamp
+from bloom import BloomFilter
+import loan_math
+import metrics
 
 # --- 1. Load Environment Variables ---
 # Load the .env file (e.g., 'api_secret.env')
@@ -20,17 +35,16 @@ DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_NAME = os.environ.get("DB_NAME", "postgres")
 
-if not DB_PASSWORD:
-    raise ValueError("DB_PASSWORD environment variable is not set!")
-
-encoded_password = quote_plus(DB_PASSWORD)
+# Checked at startup (see lifespan below), so importing this module is safe without it.
+encoded_password = quote_plus(DB_PASSWORD or "")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 
 
 class LoanApplicationLog(BaseModel):
-    application_id : str
+    # Time-ordered UUIDv7 minted by the agent; the server mints one if omitted.
+    application_id : Optional[UUID] = None
     customer_id: int
     plan_name: str
     amount: int
@@ -50,55 +64,350 @@ class AddNewCustomer(BaseModel):
 # This is a production-grade practice. Instead of one connection,
 # we create a "pool" of connections. This is much faster and
 # more stable for an app that gets many requests.
-try:
-    psql_pool = SimpleConnectionPool(
-        minconn=1,
-        maxconn=10,
-        dsn=DATABASE_URL
-    )
-    print("Database connection pool created successfully.")
-except Exception as e:
-    print(f"Error creating connection pool: {e}")
-    # Handle the error appropriately, maybe exit
-    exit()
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe pool that makes callers wait for a free connection instead of
+    failing immediately when all of them are checked out (FastAPI runs sync
+    endpoints on a thread pool larger than ours). Time spent waiting is
+    recorded as the 'db_pool.wait_ms' metric.
+    """
+
+    def __init__(self, minconn, maxconn, *args, acquire_timeout=5.0, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.acquire_timeout = acquire_timeout
+
+    def getconn(self, key=None):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            metrics.increment("db_pool.timeouts")
+            raise PoolError("Timed out waiting for a database connection")
+        metrics.observe("db_pool.wait_ms", (time.perf_counter() - started) * 1000)
+
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+# Everything below that touches the database (the pool, migrations, the
+# partition and Bloom filter timers) runs in the app's lifespan, not at
+# import, so the module can be imported cheaply (e.g. by http_client's
+# in-process transport, which then enters the lifespan itself).
+psql_pool = None
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+# Background timers, cancelled at shutdown
+_timers = {}
+_stopping = threading.Event()
+
+
+def schedule(name, interval, function):
+    """Runs `function` after `interval` seconds on a daemon timer, unless the server is shutting down."""
+    if _stopping.is_set():
+        return
+    timer = threading.Timer(interval, function)
+    timer.daemon = True
+    _timers[name] = timer
+    timer.start()
+
+
+def create_pool():
+    global psql_pool
+    if not DB_PASSWORD:
+        raise ValueError("DB_PASSWORD environment variable is not set!")
+    try:
+        psql_pool = BlockingConnectionPool(
+            minconn=DB_POOL_MIN,
+            maxconn=DB_POOL_MAX,
+            dsn=DATABASE_URL,
+            acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT
+        )
+        print("Database connection pool created successfully.")
+    except Exception as e:
+        print(f"Error creating connection pool: {e}")
+        raise
+
+
+def run_startup_migrations():
+    """Brings the schema (tables + hot-path indexes) up to date with a single pooled connection."""
+    migration_conn = psql_pool.getconn()
+    try:
+        run_migrations(migration_conn)
+    finally:
+        psql_pool.putconn(migration_conn)
+
+
+# applications2 is partitioned by month. Keep the next few months created
+# ahead of time so inserts never land in the default partition.
+PARTITION_MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+
+def maintain_partitions():
+    conn = None
+    try:
+        conn = psql_pool.getconn()
+        ensure_future_partitions(conn)
+    except Exception as e:
+        print(f"Partition maintenance failed: {e}")
+    finally:
+        if conn:
+            psql_pool.putconn(conn)
+
+    schedule("partitions", PARTITION_MAINTENANCE_INTERVAL_SECONDS, maintain_partitions)
+
+
+# --- Bloom filter of registered phones ---
+# Lets /crm/verify answer "no such customer" for unknown numbers (typos, new
+# users, probing) without taking a pooled connection. Bulk-loaded at startup
+# from a streaming scan, then topped up by /add_customer and by a periodic
+# scan of ids added since the last load (e.g. by seed_data.py or another
+# server process). A phone added elsewhere can be rejected for at most
+# PHONE_FILTER_REFRESH_SECONDS.
+PHONE_FILTER_ENABLED = os.environ.get("PHONE_FILTER_ENABLED", "true").lower() == "true"
+PHONE_FILTER_ERROR_RATE = float(os.environ.get("PHONE_FILTER_ERROR_RATE", "0.001"))
+PHONE_FILTER_REFRESH_SECONDS = int(os.environ.get("PHONE_FILTER_REFRESH_SECONDS", "30"))
+PHONE_FILTER_MIN_CAPACITY = 100_000
+PHONE_SCAN_FETCH_SIZE = 10_000
+# Serial ids can commit out of order, so each incremental scan re-reads a few
+# ids below the last maximum. Re-adding a phone is harmless.
+PHONE_SCAN_ID_OVERLAP = 1_000
+
+phone_filter = None
+phone_filter_max_id = 0
+
+
+def load_phones_into(bloom_filter, after_id):
+    """Streams phones of customers with id > after_id into the filter; returns the highest id seen."""
+    conn = None
+    cursor = None
+    max_id = after_id
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor(name=f"phone_scan_{uuid4().hex}")
+        cursor.itersize = PHONE_SCAN_FETCH_SIZE
+        cursor.execute("SELECT id, phone FROM customers WHERE id > %s", (after_id,))
+        for customer_id, phone in cursor:
+            bloom_filter.add(phone)
+            max_id = max(max_id, customer_id)
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.rollback()
+            psql_pool.putconn(conn)
+    return max_id
+
+
+def build_phone_filter():
+    """Builds a fresh filter sized for twice the current customer count (room to grow)."""
+    global phone_filter, phone_filter_max_id
+
+    conn = psql_pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM customers")
+            customer_count = cursor.fetchone()[0]
+        conn.rollback()
+    finally:
+        psql_pool.putconn(conn)
+
+    new_filter = BloomFilter(max(PHONE_FILTER_MIN_CAPACITY, 2 * customer_count), PHONE_FILTER_ERROR_RATE)
+    max_id = load_phones_into(new_filter, 0)
+
+    phone_filter, phone_filter_max_id = new_filter, max_id
+    print(f"Phone Bloom filter loaded with {len(new_filter):,} phones "
+          f"({new_filter.num_bits / 8 / 1024 / 1024:.1f} MB, {new_filter.num_hashes} hashes).")
+
+
+def refresh_phone_filter():
+    global phone_filter_max_id
+    try:
+        if len(phone_filter) > phone_filter.capacity:
+            # Past its design capacity the false-positive rate climbs; resize.
+            build_phone_filter()
+        else:
+            phone_filter_max_id = load_phones_into(
+                phone_filter, max(0, phone_filter_max_id - PHONE_SCAN_ID_OVERLAP)
+            )
+    except Exception as e:
+        print(f"Phone filter refresh failed: {e}")
+
+    schedule("phone_filter", PHONE_FILTER_REFRESH_SECONDS, refresh_phone_filter)
+
+
+def load_phone_filter():
+    global phone_filter
+    try:
+        build_phone_filter()
+        schedule("phone_filter", PHONE_FILTER_REFRESH_SECONDS, refresh_phone_filter)
+    except Exception as e:
+        # Without a filter every request simply goes to Postgres.
+        print(f"Could not load phone Bloom filter, continuing without it: {e}")
+        phone_filter = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Startup: pool, migrations, partitions, Bloom filter. Shutdown: timers and pool."""
+    _stopping.clear()
+    # A failure here (e.g. no database) aborts startup instead of serving 500s
+    create_pool()
+    if RUN_MIGRATIONS_ON_STARTUP:
+        run_startup_migrations()
+    maintain_partitions()
+    if PHONE_FILTER_ENABLED:
+        load_phone_filter()
+    try:
+        yield
+    finally:
+        _stopping.set()
+        for timer in _timers.values():
+            timer.cancel()
+        psql_pool.closeall()
+
+
+def month_bounds(day: date):
+    """Returns [first day of the month, first day of the next month) for `day`."""
+    start = day.replace(day=1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def parse_month(month: str):
+    """Parses a 'YYYY-MM' string into month bounds, or raises a 400."""
+    try:
+        year, month_number = (int(part) for part in month.split("-"))
+        return month_bounds(date(year, month_number, 1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be in YYYY-MM format")
+
+
+# Columns the read endpoints return. Read paths project these explicitly
+# (never SELECT *) so secrets like the PIN can't leak into a response.
+CUSTOMER_PUBLIC_COLUMNS = "id, name, phone, address, pre_approved_limit, credit_score"
+LOAN_OPTION_PUBLIC_COLUMNS = "id, plan_name, amount, interest_rate, tenure_years"
+APPLICATION_COLUMNS = "application_id, customer_id, plan_name, amount, interest_rate, tenure_years, application_date"
+
+# Plans a customer can be offered, from the customer_plan_eligibility matrix
+# (see db_migrations.py). `customer_id` is filled in with a column or placeholder.
+ELIGIBLE_OPTIONS_SUBQUERY = """
+    SELECT lo.id, lo.plan_name, lo.amount, lo.interest_rate, lo.tenure_years, e.eligibility
+    FROM customer_plan_eligibility e
+    JOIN loan_options lo ON lo.id = e.plan_id
+    WHERE e.customer_id = {customer_id} AND e.eligibility <> 'ineligible'
+"""
 
 
 # --- 3. Initialize the FastAPI App ---
 app = FastAPI(
     title="Tata Capital Mock API Server",
-    description="Provides CRM and Loan Option endpoints for the Agentic AI."
+    description="Provides CRM and Loan Option endpoints for the Agentic AI.",
+    lifespan=lifespan,
 )
 
+# Per-endpoint latency, recorded for every request.
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route else request.url.path
+    metrics.observe(f"http.{request.method} {path}.ms", (time.perf_counter() - started) * 1000)
+    metrics.increment(f"http.{request.method} {path}.status_{response.status_code}")
+    return response
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Counters, gauges and latency percentiles for this server process."""
+    metrics.set_gauge("db_pool.size", DB_POOL_MAX)
+    if phone_filter is not None:
+        metrics.set_gauge("phone_filter.items", len(phone_filter))
+        metrics.set_gauge("phone_filter.capacity", phone_filter.capacity)
+        metrics.set_gauge("phone_filter.fill_ratio", round(phone_filter.fill_ratio(), 4))
+        metrics.set_gauge("phone_filter.estimated_false_positive_rate",
+                          phone_filter.estimated_false_positive_rate())
+    return metrics.snapshot()
+
+
+@app.post("/metrics/reset")
+def reset_metrics():
+    """Clears all metrics, e.g. right before a load test run."""
+    metrics.reset()
+    return {"status": "success"}
+
+
 # --- 4. The "CRM Server" Endpoint ---
+def reject_unknown_phone(phone: str):
+    """Raises a 404 without touching Postgres if the Bloom filter has never seen `phone`."""
+    if phone_filter is None:
+        return
+    if phone not in phone_filter:
+        # Definitely not a registered phone: answer without touching Postgres.
+        metrics.increment("phone_filter.definite_miss")
+        raise HTTPException(status_code=404, detail="Customer not found")
+    metrics.increment("phone_filter.maybe_present")
+
+
 @app.get("/crm/verify")
 def verify_customer(phone: str, pin : str):
     """
     This is the mock CRM API endpoint (the "Verification Agent's" tool).
     It searches the database for a customer by their phone number.
+    Postgres builds the JSON response itself; we pass the bytes straight through.
     """
     print(f"Received request for /crm/verify with phone: {phone}")
+    reject_unknown_phone(phone)
     
-    # Define the SQL query
-    query = "SELECT * FROM customers WHERE phone = %s and pin = %s"
+    # Define the SQL query.
+    # Only the columns the agent needs (never the PIN), serialized by row_to_json.
+    query = f"""
+    SELECT json_build_object('status', 'Verified', 'data', row_to_json(c))::text
+    FROM (
+        SELECT {CUSTOMER_PUBLIC_COLUMNS}
+        FROM customers
+        WHERE phone = %s AND pin = %s
+    ) c
+    """
     
     conn = None
     cursor = None
     try:
         # Get a connection from the pool
         conn = psql_pool.getconn()
-        # Use RealDictCursor to get results as dictionaries (like JSON)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute(query, (phone, pin,))
-        customer_data = cursor.fetchone()
+        row = cursor.fetchone()
         
-        if customer_data:
-            print(f"Found customer: {customer_data['name']}")
-            return {"status": "Verified", "data": customer_data}
+        if row:
+            print("Found customer.")
+            return Response(content=row[0], media_type="application/json")
         else:
             print("Customer not found.")
+            # The filter said "maybe": either a false positive or a wrong PIN.
+            # This count is an upper bound on observed false positives.
+            if phone_filter is not None:
+                metrics.increment("phone_filter.maybe_present_not_found")
             raise HTTPException(status_code=404, detail="Customer not found")
             
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Database error in /crm/verify: {e}")
         raise HTTPException(status_code=500, detail="Database internal error")
@@ -109,33 +418,146 @@ def verify_customer(phone: str, pin : str):
         if conn:
             psql_pool.putconn(conn)
 
+@app.get("/crm/customer360")
+def customer_360(phone: str, pin: str, applications_limit: int = Query(10, ge=0, le=100)):
+    """
+    Verifies a customer and returns everything the agent needs for the rest of
+    the conversation in one round trip and one query plan:
+      - data: the customer profile (same shape as /crm/verify)
+      - options: plans for their credit score that pass the 2x pre-approved-limit
+        rule, each tagged 'instant' (within the limit) or 'income_proof'
+      - applications: their most recent applications, newest first
+    """
+    print(f"Received request for /crm/customer360 with phone: {phone}")
+    reject_unknown_phone(phone)
+
+    query = f"""
+    WITH c AS (
+        SELECT {CUSTOMER_PUBLIC_COLUMNS}
+        FROM customers
+        WHERE phone = %s AND pin = %s
+    )
+    SELECT json_build_object(
+        'status', 'Verified',
+        'data', row_to_json(c),
+        'options', COALESCE((
+            SELECT json_agg(o ORDER BY o.id)
+            FROM ({ELIGIBLE_OPTIONS_SUBQUERY.format(customer_id="c.id")}) o
+        ), '[]'::json),
+        'applications', COALESCE((
+            SELECT json_agg(a)
+            FROM (
+                SELECT {APPLICATION_COLUMNS}
+                FROM applications2
+                WHERE customer_id = c.id
+                ORDER BY application_date DESC, application_id DESC
+                LIMIT %s
+            ) a
+        ), '[]'::json)
+    )::text
+    FROM c
+    """
+
+    conn = None
+    cursor = None
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor()
+
+        cursor.execute(query, (phone, pin, applications_limit))
+        row = cursor.fetchone()
+
+        if row:
+            print("Found customer.")
+            return Response(content=row[0], media_type="application/json")
+        else:
+            print("Customer not found.")
+            if phone_filter is not None:
+                metrics.increment("phone_filter.maybe_present_not_found")
+            raise HTTPException(status_code=404, detail="Customer not found")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Database error in /crm/customer360: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            psql_pool.putconn(conn)
+
+@app.get("/customers/{customer_id}/eligible_options")
+def get_eligible_options(customer_id: int):
+    """
+    Loan options this customer can actually get, read from the precomputed
+    customer_plan_eligibility matrix in one primary-key range lookup. Each
+    option carries its eligibility: 'instant' or 'income_proof'.
+    """
+    print(f"Received request for /customers/{customer_id}/eligible_options")
+
+    query = f"""
+    SELECT json_build_object(
+        'status', CASE WHEN COUNT(*) = 0 THEN 'No Options Found' ELSE 'Success' END,
+        'options', COALESCE(json_agg(o ORDER BY o.id), '[]'::json)
+    )::text
+    FROM ({ELIGIBLE_OPTIONS_SUBQUERY.format(customer_id="%s")}) o
+    """
+
+    conn = None
+    cursor = None
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor()
+
+        cursor.execute(query, (customer_id,))
+        options_json = cursor.fetchone()[0]
+
+        return Response(content=options_json, media_type="application/json")
+
+    except Exception as e:
+        print(f"Database error in /customers/{customer_id}/eligible_options: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            psql_pool.putconn(conn)
+
 # --- 5. The "Loan Options" Endpoint ---
 @app.get("/loans/options")
 def get_loan_options(credit_score: int):
     """
     This is the mock Loan API endpoint (the "Underwriting Agent's" tool).
     It finds loan options based on the customer's credit score.
+    The whole response, including the status, is built by json_agg in Postgres.
     """
     print(f"Received request for /loans/options with score: {credit_score}")
     
-    # Find all loans where the score is a match
-    query = "SELECT * FROM loan_options WHERE %s BETWEEN min_score AND max_score"
+    # Find all loans where the score is a match.
+    # Written as a range containment so it can use loan_options_score_band_idx.
+    query = f"""
+    SELECT json_build_object(
+        'status', CASE WHEN COUNT(*) = 0 THEN 'No Options Found' ELSE 'Success' END,
+        'options', COALESCE(json_agg(o ORDER BY o.id), '[]'::json)
+    )::text
+    FROM (
+        SELECT {LOAN_OPTION_PUBLIC_COLUMNS}
+        FROM loan_options
+        WHERE int4range(min_score, max_score, '[]') @> %s::int
+    ) o
+    """
     
     conn = None
     cursor = None
     try:
         conn = psql_pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         
         cursor.execute(query, (credit_score,))
-        options = cursor.fetchall()
+        options_json = cursor.fetchone()[0]
         
-        if not options:
-            print("No loan options found for this score.")
-            return {"status": "No Options Found", "options": []}
-        
-        print(f"Found {len(options)} loan options.")
-        return {"status": "Success", "options": options}
+        return Response(content=options_json, media_type="application/json")
 
     except Exception as e:
         print(f"Database error in /loans/options: {e}")
@@ -146,38 +568,329 @@ def get_loan_options(credit_score: int):
         if conn:
             psql_pool.putconn(conn)
 
-@app.get("/applications")
-def fetch_application(application_id: str):
-    """Mock API endpoint for fetching the loan application details based on application id """
-    query = "SELECT * from applications2 WHERE application_id = %s"
+# --- 5b. The "Loan Quote" Endpoint ---
+# EMI, total payable and total interest for every plan, computed for the
+# whole catalog in one vectorized pass and reused until loan_catalog_version
+# changes (any write to loan_options bumps it).
+_quote_cache = {"version": None, "quotes": {}}
+_quote_cache_lock = threading.Lock()
+
+
+def load_catalog_quotes(cursor):
+    """Rebuilds the quote cache from loan_options and returns {plan_id: quote}."""
+    cursor.execute("""
+        SELECT v.version, lo.id, lo.amount, lo.interest_rate, lo.tenure_years
+        FROM loan_catalog_version v
+        LEFT JOIN loan_options lo ON TRUE
+    """)
+    rows = cursor.fetchall()
+    version = rows[0]['version']
+    plans = [row for row in rows if row['id'] is not None]
+
+    emis, totals, interests = loan_math.loan_totals(
+        [plan['amount'] for plan in plans],
+        [plan['interest_rate'] for plan in plans],
+        [plan['tenure_years'] for plan in plans],
+    )
+    quotes = {
+        plan['id']: {
+            'monthly_emi': float(emi),
+            'total_payable': float(total),
+            'total_interest': float(interest),
+        }
+        for plan, emi, total, interest in zip(plans, emis.tolist(), totals.tolist(), interests.tolist())
+    }
+
+    with _quote_cache_lock:
+        _quote_cache["version"], _quote_cache["quotes"] = version, quotes
+    metrics.increment("loan_quote.cache_rebuilds")
+    print(f"Rebuilt loan quote cache for catalog version {version} ({len(quotes)} plans)")
+    return quotes
+
+
+@app.get("/loans/quote")
+def get_loan_quotes(customer_id: Optional[int] = None, credit_score: Optional[int] = None):
+    """
+    Every plan the customer can be offered, each with its monthly EMI, total
+    payable and total interest. With customer_id the plans come from the
+    eligibility matrix (and carry their eligibility); with only a credit
+    score, every plan whose band contains it is quoted.
+    """
+    print(f"Received request for /loans/quote: customer_id={customer_id}, credit_score={credit_score}")
+
+    if customer_id is not None:
+        query = f"""
+        SELECT o.*, (SELECT version FROM loan_catalog_version) AS catalog_version
+        FROM ({ELIGIBLE_OPTIONS_SUBQUERY.format(customer_id="%s")}) o
+        ORDER BY o.id
+        """
+        params = (customer_id,)
+    elif credit_score is not None:
+        query = f"""
+        SELECT {LOAN_OPTION_PUBLIC_COLUMNS}, (SELECT version FROM loan_catalog_version) AS catalog_version
+        FROM loan_options
+        WHERE int4range(min_score, max_score, '[]') @> %s::int
+        ORDER BY id
+        """
+        params = (credit_score,)
+    else:
+        raise HTTPException(status_code=400, detail="Pass customer_id or credit_score")
+
     conn = None
     cursor = None
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    conn = psql_pool.getconn()
-    cursor = conn.cursor()
+        cursor.execute(query, params)
+        options = cursor.fetchall()
+        if not options:
+            return {"status": "No Options Found", "quotes": []}
 
-    cursor.execute(query, (application_id,))
-    
+        version = options[0]['catalog_version']
+        with _quote_cache_lock:
+            quotes = _quote_cache["quotes"] if _quote_cache["version"] == version else None
+        if quotes is None:
+            quotes = load_catalog_quotes(cursor)
+        else:
+            metrics.increment("loan_quote.cache_hits")
 
+        results = []
+        for option in options:
+            option.pop('catalog_version')
+            # Only missing if the catalog changed between the two queries
+            quote = quotes.get(option['id'])
+            if quote:
+                results.append({**option, **quote})
+
+        return {"status": "Success", "catalog_version": version, "quotes": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Database error in /loans/quote: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            psql_pool.putconn(conn)
+
+@app.get("/applications")
+def fetch_application(application_id: UUID, application_date: Optional[date] = None):
+    """
+    Mock API endpoint for fetching the loan application details based on application id.
+    If the caller knows roughly when the application was made, passing `application_date`
+    lets Postgres prune the lookup down to that month's partition. UUIDv7 ids carry
+    their own creation time, so they get the same pruning without a hint.
+    """
+    query = "SELECT * FROM applications2 WHERE application_id = %s"
+    params = [str(application_id)]
+
+    minted_at = uuid7_timestamp(application_id)
+    if application_date:
+        start, end = month_bounds(application_date)
+        query += " AND application_date >= %s AND application_date < %s"
+        params += [start, end]
+    elif minted_at:
+        # The row is inserted moments after the id is minted; a day either
+        # side absorbs clock skew and month boundaries.
+        query += " AND application_date >= %s AND application_date < %s"
+        params += [minted_at - timedelta(days=1), minted_at + timedelta(days=1)]
+
+    conn = None
+    cursor = None
     try:
-        application = query.fetchone()
+        conn = psql_pool.getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute(query, params)
+        application = cursor.fetchone()
+
         if not application:
             print("Application does not exist")
-            return {"status": "No Options Found", "options": ()}
-        
+            raise HTTPException(status_code=404, detail="Application not found")
+
         print("Found the loan application! ")
         return {'status': 'Success', 'application': application}
-    
-    except:
-        raise HTTPException(status_code=500)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Database error in /applications: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
     finally:
         if cursor:
             cursor.close()
         if conn:
             psql_pool.putconn(conn)
-        
 
 
+@app.get("/applications/export")
+def export_applications(month: str):
+    """
+    Month-end export of every application logged in `month` (YYYY-MM) as CSV.
+    The date range matches exactly one partition, so the cost of the export
+    depends on that month's volume rather than the size of the whole book.
+    """
+    start, end = parse_month(month)
+    print(f"Received request for /applications/export for {start:%Y-%m}")
+
+    conn = None
+    cursor = None
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor()
+
+        select_query = cursor.mogrify(
+            """SELECT application_id, customer_id, plan_name, amount, interest_rate,
+                      tenure_years, application_date
+               FROM applications2
+               WHERE application_date >= %s AND application_date < %s
+               ORDER BY application_date""",
+            (start, end)
+        ).decode()
+
+        # Spill to disk past 8MB so big months don't sit in memory.
+        export_file = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b")
+        cursor.copy_expert(f"COPY ({select_query}) TO STDOUT WITH CSV HEADER", export_file)
+        conn.commit()
+        export_file.seek(0)
+
+    except Exception as e:
+        if conn: conn.rollback()
+        print(f"Database error in /applications/export: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            psql_pool.putconn(conn)
+
+    def file_chunks():
+        with export_file:
+            while chunk := export_file.read(64 * 1024):
+                yield chunk
+
+    return StreamingResponse(
+        file_chunks(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=applications_{start:%Y_%m}.csv"}
+    )
+
+
+# Keyset pagination over a customer's applications, newest first.
+# The cursor is the (application_date, application_id) of the last row on
+# the previous page, so every page is a bounded index range scan no matter
+# how deep the client pages.
+STREAM_FETCH_SIZE = 500
+
+
+def encode_page_cursor(application_date, application_id):
+    raw = f"{application_date.isoformat()}|{application_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_page_cursor(cursor_token: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor_token.encode()).decode()
+        application_date, application_id = raw.split("|")
+        return datetime.fromisoformat(application_date), str(UUID(application_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def stream_customer_applications(customer_id: int):
+    """
+    Yields every application of a customer as NDJSON using a named
+    (server-side) cursor, so only STREAM_FETCH_SIZE rows are in memory at once.
+    The pooled connection is held until the stream finishes or the client goes away.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = psql_pool.getconn()
+        cursor = conn.cursor(name=f"customer_apps_{uuid4().hex}", cursor_factory=RealDictCursor)
+        cursor.itersize = STREAM_FETCH_SIZE
+        cursor.execute(
+            f"""SELECT {APPLICATION_COLUMNS} FROM applications2
+                WHERE customer_id = %s
+                ORDER BY application_date DESC, application_id DESC""",
+            (customer_id,)
+        )
+        for row in cursor:
+            yield json.dumps(row, default=str) + "\n"
+
+    except Exception as e:
+        print(f"Database error while streaming applications: {e}")
+        yield json.dumps({"status": "error", "detail": "Database internal error"}) + "\n"
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.rollback()  # end the read-only transaction the named cursor lived in
+            psql_pool.putconn(conn)
+
+
+@app.get("/customers/{customer_id}/applications")
+def list_customer_applications(
+    customer_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Lists a customer's loan applications, newest first.
+
+    - format=json (default): one page of at most `limit` rows plus a `next_cursor`
+      to pass back for the following page.
+    - format=ndjson: streams every application, one JSON object per line.
+    """
+    print(f"Received request for /customers/{customer_id}/applications ({format})")
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_customer_applications(customer_id),
+            media_type="application/x-ndjson"
+        )
+
+    query = f"SELECT {APPLICATION_COLUMNS} FROM applications2 WHERE customer_id = %s"
+    params = [customer_id]
+    if cursor:
+        after_date, after_id = decode_page_cursor(cursor)
+        query += " AND (application_date, application_id) < (%s::timestamptz, %s::uuid)"
+        params += [after_date, after_id]
+    query += " ORDER BY application_date DESC, application_id DESC LIMIT %s"
+    # Fetch one extra row to know whether there is another page.
+    params.append(limit + 1)
+
+    conn = None
+    db_cursor = None
+    try:
+        conn = psql_pool.getconn()
+        db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        db_cursor.execute(query, params)
+        rows = db_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_page_cursor(last["application_date"], last["application_id"])
+
+        print(f"Returning {len(rows)} application(s).")
+        return {"status": "Success", "applications": rows, "next_cursor": next_cursor}
+
+    except Exception as e:
+        print(f"Database error in /customers/{customer_id}/applications: {e}")
+        raise HTTPException(status_code=500, detail="Database internal error")
+    finally:
+        if db_cursor:
+            db_cursor.close()
+        if conn:
+            psql_pool.putconn(conn)
+
 
 @app.post("/applications/log")
 def log_application(loan_log: LoanApplicationLog):
@@ -185,6 +898,8 @@ def log_application(loan_log: LoanApplicationLog):
     Logs a finalized loan application into the 'applications' table.
     """
     print(f"Received request to log application for customer: {loan_log.customer_id}")
+
+    application_id = str(loan_log.application_id or uuid7())
     
     query = """
     INSERT INTO applications2 (application_id, customer_id, plan_name, amount, interest_rate, tenure_years)
@@ -198,7 +913,7 @@ def log_application(loan_log: LoanApplicationLog):
         cursor = conn.cursor()
         
         cursor.execute(query, (
-            loan_log.application_id,
+            application_id,
             loan_log.customer_id,
             loan_log.plan_name,
             loan_log.amount,
@@ -208,8 +923,8 @@ def log_application(loan_log: LoanApplicationLog):
         
         conn.commit()
         
-        print(f"Successfully logged new application with ID: {loan_log.application_id}")
-        return {"status": "success", "application_id": loan_log.application_id}
+        print(f"Successfully logged new application with ID: {application_id}")
+        return {"status": "success", "application_id": application_id}
         
     except Exception as e:
         if conn: conn.rollback()
@@ -247,6 +962,9 @@ def add_new_customer(user_details : AddNewCustomer):
         customer_id = cursor.fetchone()[0]
         conn.commit()
 
+        if phone_filter is not None:
+            phone_filter.add(user_details.customer_phone)
+
         print(f"Sucessfully created account for {user_details.customer_name}")
         return {'status': 'Success', 'customer_id': customer_id}
     
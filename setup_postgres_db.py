@@ -1,6 +1,7 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from db_migrations import run_migrations
 
 def setup_database():
     load_dotenv('api_secret.env')
@@ -11,28 +12,19 @@ def setup_database():
     DB_PASSWORD = os.environ.get("DB_PASSWORD")
     DB_NAME = os.environ.get("DB_NAME")
 
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS customers (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        phone TEXT NOT NULL UNIQUE,
-        address TEXT NOT NULL,
-        pre_approved_limit INTEGER NOT NULL,
-        credit_score INTEGER NOT NULL
-    );
-    """
+    # The table itself (and its indexes) is owned by db_migrations.py
 
     mock_data = [
-        ('Priya Sharma', '9876543210', '123 MG Road, Bangalore', 50000, 780),
-        ('Rohan Gupta', '1234567890', '456 Main St, Delhi', 25000, 650),
-        ('Amit Singh', '5555544444', '789 Park Ave, Mumbai', 100000, 820),
-        ('Sneha Reddy', '8888899999', '101 Jubilee Hills, Hyderabad', 75000, 790),
-        ('Vikram Kumar', '7777766666', '202 Anna Salai, Chennai', 30000, 680),
-        ('Ananya Bose', '6666655555', '303 Salt Lake, Kolkata', 150000, 850),
-        ('David Lee', '9999911111', 'A-14 Koregaon Park, Pune', 40000, 710),
-        ('Zara Khan', '3333322222', 'B-7, Sector 18, Noida', 90000, 760),
-        ('Karan Malhotra', '2222211111', '505 Linking Road, Mumbai', 120000, 810),
-        ('Nisha Patel', '4444455555', 'C-9, CG Road, Ahmedabad', 20000, 620)
+        ('Priya Sharma', '9876543210', '123 MG Road, Bangalore', 50000, 780, '1234'),
+        ('Rohan Gupta', '1234567890', '456 Main St, Delhi', 25000, 650, '5678'),
+        ('Amit Singh', '5555544444', '789 Park Ave, Mumbai', 100000, 820, '4321'),
+        ('Sneha Reddy', '8888899999', '101 Jubilee Hills, Hyderabad', 75000, 790, '8765'),
+        ('Vikram Kumar', '7777766666', '202 Anna Salai, Chennai', 30000, 680, '1111'),
+        ('Ananya Bose', '6666655555', '303 Salt Lake, Kolkata', 150000, 850, '2222'),
+        ('David Lee', '9999911111', 'A-14 Koregaon Park, Pune', 40000, 710, '3333'),
+        ('Zara Khan', '3333322222', 'B-7, Sector 18, Noida', 90000, 760, '4444'),
+        ('Karan Malhotra', '2222211111', '505 Linking Road, Mumbai', 120000, 810, '5555'),
+        ('Nisha Patel', '4444455555', 'C-9, CG Road, Ahmedabad', 20000, 620, '6666')
     ]
 
     try:
@@ -48,7 +40,7 @@ def setup_database():
         cursor = conn.cursor()
         print("Connection successful.")
 
-        cursor.execute(create_table_sql)
+        run_migrations(conn)
         print("Table 'customers' created successfully (or already exists).")
         
         # 6. Check if table is already populated
@@ -59,8 +51,8 @@ def setup_database():
             # 7. Insert the data
             # %s is the placeholder for psycopg2
             insert_query = """
-            INSERT INTO customers (name, phone, address, pre_approved_limit, credit_score) 
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO customers (name, phone, address, pre_approved_limit, credit_score, pin) 
+            VALUES (%s, %s, %s, %s, %s, %s)
             """
             
             cursor.executemany(insert_query, mock_data)
@@ -4,7 +4,10 @@ import uuid
 from langchain_core.messages import HumanMessage, AIMessage
 
 # --- 1. Import your compiled agent ---
-from Loan_agent import app, Loan_agent_state
+from Loan_agent import get_app, Loan_agent_state, USER_REPLY_TAG
+
+# Built once per Streamlit process (cached on the module), on first render
+app = get_app()
 
 # --- 2. Page Setup ---
 st.set_page_config(
@@ -52,6 +55,24 @@ if "conversation_started" not in st.session_state:
 if "loan_approved" not in st.session_state:
     st.session_state.loan_approved = False
 
+# Replies are streamed as the graph runs (LLM tokens as they're generated,
+# templated replies as each node finishes). Set UI_STREAM_RESPONSES=false to
+# wait for the whole turn instead.
+STREAM_RESPONSES = os.environ.get("UI_STREAM_RESPONSES", "true").lower() == "true"
+
+# Shown while the slower nodes run
+NODE_PROGRESS = {
+    "verify_customer": "🔍 Verifying your details...",
+    "register_customer": "📝 Registering your account...",
+    "present_offers": "📊 Fetching your loan offers...",
+    "extract_choice": "🧾 Reading your selection...",
+    "check_income_policy": "📋 Checking your eligibility...",
+    "verify_uploaded_income": "📄 Checking your salary slip...",
+    "calculate_amortization": "🧮 Calculating your repayment schedule...",
+    "generate_sanction": "📝 Generating your sanction letter...",
+    "handle_loan_query": "💬 Looking up your loan...",
+}
+
 # --- 5. Helper Function to Get Current State ---
 def get_current_state():
     """
@@ -67,6 +88,60 @@ def get_current_state():
         print(f"Error getting state: {e}")
         return None
 
+def stream_reply(input_data, config, status):
+    """
+    Runs one turn with app.stream and yields the reply text for
+    st.write_stream: tokens from user-facing LLM calls as they arrive, and
+    each other AI message once its node finishes. Node starts update `status`.
+    """
+    streamed_nodes = set()  # nodes whose reply already went out token by token
+    needs_separator = False
+
+    for mode, chunk in app.stream(input_data, config=config, stream_mode=["updates", "messages", "debug"]):
+        if mode == "debug":
+            if chunk.get("type") == "task" and chunk["payload"]["name"] in NODE_PROGRESS:
+                status.update(label=NODE_PROGRESS[chunk["payload"]["name"]])
+
+        elif mode == "messages":
+            message_chunk, metadata = chunk
+            if USER_REPLY_TAG in metadata.get("tags", []) and isinstance(message_chunk.content, str) and message_chunk.content:
+                if metadata["langgraph_node"] not in streamed_nodes:
+                    streamed_nodes.add(metadata["langgraph_node"])
+                    if needs_separator:
+                        yield "\n\n"
+                yield message_chunk.content
+                needs_separator = True
+
+        elif mode == "updates":
+            for node, update in chunk.items():
+                if node in streamed_nodes:
+                    streamed_nodes.discard(node)
+                    continue
+                for message in (update or {}).get("messages", []):
+                    if isinstance(message, AIMessage) and message.content:
+                        if needs_separator:
+                            yield "\n\n"
+                        yield message.content
+                        needs_separator = True
+
+
+def run_turn(input_data, config):
+    """Runs one turn, rendering the reply as it's produced; returns the final state."""
+    if not STREAM_RESPONSES:
+        with st.spinner("Thinking..."):
+            final_state = app.invoke(input_data, config=config)
+        if final_state and final_state.get("messages"):
+            st.markdown(final_state["messages"][-1].content)
+        return final_state
+
+    status = st.status("Thinking...")
+    reply = st.write_stream(stream_reply(input_data, config, status))
+    status.update(label="Done", state="complete")
+    final_state = app.get_state(config).values
+    if not reply and final_state and final_state.get("messages"):
+        st.markdown(final_state["messages"][-1].content)
+    return final_state
+
 # --- 6. The Sidebar ---
 with st.sidebar:
     st.header("📋 Application Status")
@@ -168,57 +243,46 @@ if prompt := st.chat_input("Type your message here..."):
     with st.chat_message("user", avatar="👤"):
         st.markdown(prompt)
     
-    # Show assistant thinking
+    # Show the assistant's reply as it's produced
     with st.chat_message("assistant", avatar="🤖"):
-        with st.spinner("Thinking..."):
-            try:
-                # ✅ FIX 3: Prepare input correctly
-                input_data = {"messages": [HumanMessage(content=prompt)]}
-                config = {"configurable": {"thread_id": st.session_state.thread_id}}
+        try:
+            # ✅ FIX 3: Prepare input correctly
+            input_data = {"messages": [HumanMessage(content=prompt)]}
+            config = {"configurable": {"thread_id": st.session_state.thread_id}}
+            
+            # Call the agent
+            final_state = run_turn(input_data, config)
+            
+            # ✅ FIX 4: Handle different response types
+            if final_state and "messages" in final_state:
+                # ✅ FIX 5: Update session state metadata
+                if final_state.get("customer_id"):
+                    st.session_state.customer_id = final_state["customer_id"]
                 
-                # Call the agent
-                final_state = app.invoke(input_data, config=config)
+                if final_state.get("loan_approved"):
+                    st.session_state.loan_approved = True
+                    st.balloons()  # Celebration effect!
                 
-                # ✅ FIX 4: Handle different response types
-                if final_state and "messages" in final_state:
-                    last_message = final_state["messages"][-1]
-                    
-                    if isinstance(last_message, AIMessage):
-                        response_content = last_message.content
-                    else:
-                        response_content = str(last_message.content)
-                    
-                    # Display the response
-                    st.markdown(response_content)
-                    
-                    # ✅ FIX 5: Update session state metadata
-                    if final_state.get("customer_id"):
-                        st.session_state.customer_id = final_state["customer_id"]
-                    
-                    if final_state.get("loan_approved"):
-                        st.session_state.loan_approved = True
-                        st.balloons()  # Celebration effect!
-                    
-                    # ✅ FIX 6: Check for sanction letter
-                    if final_state.get("sanction_letter_path"):
-                        letter_path = final_state["sanction_letter_path"]
-                        if os.path.exists(letter_path):
-                            with open(letter_path, "rb") as pdf_file:
-                                pdf_bytes = pdf_file.read()
-                                st.download_button(
-                                    label="📄 Download Sanction Letter",
-                                    data=pdf_bytes,
-                                    file_name=os.path.basename(letter_path),
-                                    mime="application/pdf"
-                                )
-                else:
-                    st.error("❌ Received invalid response from agent.")
-                    
-            except Exception as e:
-                st.error(f"❌ An error occurred: {str(e)}")
-                print(f"Error details: {e}")
-                import traceback
-                traceback.print_exc()
+                # ✅ FIX 6: Check for sanction letter
+                if final_state.get("sanction_letter_path"):
+                    letter_path = final_state["sanction_letter_path"]
+                    if os.path.exists(letter_path):
+                        with open(letter_path, "rb") as pdf_file:
+                            pdf_bytes = pdf_file.read()
+                            st.download_button(
+                                label="📄 Download Sanction Letter",
+                                data=pdf_bytes,
+                                file_name=os.path.basename(letter_path),
+                                mime="application/pdf"
+                            )
+            else:
+                st.error("❌ Received invalid response from agent.")
+                
+        except Exception as e:
+            st.error(f"❌ An error occurred: {str(e)}")
+            print(f"Error details: {e}")
+            import traceback
+            traceback.print_exc()
     
     # ✅ FIX 7: Force a rerun to update the sidebar
     st.rerun()